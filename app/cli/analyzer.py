@@ -1,20 +1,34 @@
+import atexit
 import click
 import httpx
 import json
 import os
+from functools import lru_cache
 from typing import Optional
 import sys
 
+@lru_cache(maxsize=None)
+def get_client(base_url: str) -> httpx.Client:
+    """Shared pooled HTTP/2 client per base URL, closed at interpreter exit"""
+    client = httpx.Client(
+        base_url=base_url,
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+    )
+    atexit.register(client.close)
+    return client
+
 class LogAnalyzer:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url
-        self.client = httpx.Client(timeout=30.0)
+        self.client = get_client(base_url)
 
     def analyze_prompt(self, prompt: str, context: dict = None) -> dict:
         """Send prompt for analysis"""
         try:
             response = self.client.post(
-                f"{self.base_url}/analyze-prompt",
+                "/analyze-prompt",
                 json={"prompt": prompt, "context": context or {}}
             )
             response.raise_for_status()
@@ -25,7 +39,7 @@ class LogAnalyzer:
     def get_analysis(self, batch_id: str) -> dict:
         """Get analysis results"""
         try:
-            response = self.client.get(f"{self.base_url}/analyze/{batch_id}")
+            response = self.client.get(f"/analyze/{batch_id}")
             response.raise_for_status()
             return response.json()
         except Exception as e:
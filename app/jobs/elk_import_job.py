@@ -1,51 +1,72 @@
-from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.services.elk_service import ElkService
 from app.repositories.log_repository import LogRepository
 from app.models.log_model import ElkLog
 from dotenv import load_dotenv
+from typing import Optional
+import asyncio
 import os
 
 # Load environment variables
 load_dotenv()
 
-def import_elk_logs():
+# Number of validated logs upserted per bulk write
+IMPORT_FLUSH_SIZE = 1000
+
+# Initialize services once; every scheduled run reuses their connection pools
+elk_service = ElkService(
+    elk_url=os.getenv("ELK_URL", "http://localhost:9200")
+)
+
+log_repository = LogRepository.for_ingest(
+    db_uri=os.getenv("MONGODB_URI"),
+    db_name="logs_db",
+    collection_name="logs"
+)
+
+def _add_count(total: Optional[int], count: Optional[int]) -> Optional[int]:
+    """Sum upsert counts; None once any write was unacknowledged"""
+    return None if total is None or count is None else total + count
+
+async def import_elk_logs():
     print("Starting ELK log import...")
     
-    # Initialize services
-    elk_service = ElkService(
-        elk_url=os.getenv("ELK_URL", "http://localhost:9200")
-    )
-    
-    log_repository = LogRepository(
-        db_uri=os.getenv("MONGODB_URI"),
-        db_name="logs_db",
-        collection_name="logs"
-    )
-    
     try:
-        # Get recent logs from ELK
-        elk_logs = elk_service.get_recent_logs(minutes=5)
-        
-        # Convert and save to MongoDB
-        for log_data in elk_logs:
+        # Stream recent logs from ELK, converting them as pages arrive and
+        # skipping any that fail validation
+        logs = []
+        fetched = 0
+        saved_count = 0
+        async for log_data in elk_service.get_recent_logs(minutes=5):
+            fetched += 1
             try:
-                # Create ElkLog model
-                log = ElkLog.model_validate(log_data)
-                
-                # Save to MongoDB if not exists
-                if not log_repository.log_exists(log.source.timestamp, log.source.message):
-                    log_repository.save_log(log)
-                    print(f"Saved log from {log.source.timestamp}")
+                logs.append(ElkLog.model_validate(log_data))
             except Exception as e:
                 print(f"Error processing log: {str(e)}")
                 continue
-                
-        print(f"Imported {len(elk_logs)} logs")
+
+            # Upsert in bounded chunks; duplicates are left untouched
+            if len(logs) >= IMPORT_FLUSH_SIZE:
+                saved_count = _add_count(saved_count, log_repository.bulk_upsert_logs(logs))
+                logs = []
+
+        saved_count = _add_count(saved_count, log_repository.bulk_upsert_logs(logs))
+        if saved_count is None:
+            print(f"Imported {fetched} logs")
+        else:
+            print(f"Imported {fetched} logs ({saved_count} new)")
     except Exception as e:
         print(f"Error in import job: {str(e)}")
 
 if __name__ == "__main__":
     print("Starting ELK import job...")
-    scheduler = BlockingScheduler()
+    # Run on one event loop so the async Elasticsearch client is reused
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    scheduler = AsyncIOScheduler(event_loop=loop)
     scheduler.add_job(import_elk_logs, 'interval', minutes=5)
-    scheduler.start() 
\ No newline at end of file
+    scheduler.start()
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(elk_service.close())
\ No newline at end of file
@@ -1,52 +1,114 @@
-from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.services.log_service import LogService
 from app.services.ai_service import AIService
+from app.services.cached_ai_service import CachedAIService
 from app.utils.slack_notifier import SlackNotifier
 from app.repositories.log_repository import LogRepository
 from dotenv import load_dotenv
+from datetime import datetime
+import asyncio
 import os
 
 # Load environment variables from .env file
 load_dotenv()
 
-def analyze_logs():
-    print("Analyzing logs...")
-    
-    # Initialize services
-    log_repository = LogRepository(
-        db_uri=os.getenv("MONGODB_URI"),
-        db_name="logs_db",
-        collection_name="logs"
-    )
-    log_service = LogService(log_repository)
+# Number of analyzed logs to accumulate before flushing updates to MongoDB
+BULK_FLUSH_SIZE = 100
+
+# With OPENAI_BATCH_API set, logs are analyzed once a night through the
+# half-price OpenAI Batch API instead of every 5 minutes in realtime
+USE_BATCH_API = os.getenv("OPENAI_BATCH_API", "").lower() in ("1", "true", "yes")
+
+# Number of logs submitted per Batch API job
+BATCH_API_JOB_SIZE = 5000
+
+# Initialize the repository once; every scheduled run reuses its connection pool
+log_repository = LogRepository(
+    db_uri=os.getenv("MONGODB_URI"),
+    db_name="logs_db",
+    collection_name="logs"
+)
+log_service = LogService(log_repository)
+
+def create_ai_service() -> AIService:
     api_key = os.getenv("OPENAI_API_KEY")
     print(f"Using API key: {api_key[:10]}...")  # Print first 10 chars for debugging
-    ai_service = AIService(api_key)
-    # slack_notifier = SlackNotifier()
-    
-    # Get unanalyzed logs
-    logs = log_service.get_unanalyzed_logs()
-    
-    for log in logs:
+    if os.getenv("REDIS_URL"):
+        return CachedAIService(api_key, redis_url=os.getenv("REDIS_URL"))
+    return AIService(api_key)
+
+# Created once so the cached service's in-process embedding index survives between runs
+ai_service = create_ai_service()
+
+async def process_all(ai_service: AIService, log_service: LogService, use_batch_api: bool = False):
+    """Analyze unanalyzed logs concurrently, flushing updates once per chunk.
+
+    Each chunk is fetched with its own query, so no MongoDB cursor is left idle
+    while its logs are analyzed. With use_batch_api each chunk is submitted as
+    one OpenAI Batch API job; every job is submitted up front and its chunk is
+    marked as soon as it finishes, so a backlog of chunks shares one 24h window.
+    """
+    chunk_size = BATCH_API_JOB_SIZE if use_batch_api else BULK_FLUSH_SIZE
+
+    # Concurrency is capped by AIService's OPENAI_CONCURRENCY semaphore
+    async def _one(log):
         try:
-            # Analyze log with AI
-            analysis = ai_service.analyze_log(log)
+            return log, await ai_service.analyze_log(log)
+        except Exception as e:
+            print(f"Error processing log: {str(e)}")
+            return log, None
+
+    async def _batch(chunk):
+        try:
+            return list(zip(chunk, await ai_service.submit_batch_job(chunk)))
+        except Exception as e:
+            print(f"Error processing batch job: {str(e)}")
+            return []
+
+    def _flush(results):
+        analyzed = []
+        for log, analysis in results:
+            if analysis is None:
+                continue
             print(analysis)
-            # Update log with analysis
-            log_service.mark_log_as_analyzed(log.id, analysis)
-            
+            analyzed.append((log.id, analysis))
+
             # Send notification if critical
-            if "error" in log.level.lower():
-                # slack_notifier.send_notification(
-                #     f"Critical Log Detected!\nSource: {log.source}\nMessage: {log.message}\nAnalysis: {analysis}"
+            if "error" in (log.source.level or "").lower():
+                # await slack_notifier.send_notification(
+                #     f"Critical Log Detected!\nSource: {log.source}\nMessage: {log.source.message}\nAnalysis: {analysis}"
                 # )
-                print(f"Critical Log Detected!\nSource: {log.source}\nMessage: {log.message}\nAnalysis: {analysis}")
-        except Exception as e:
-            print(f"Error processing log: {str(e)}")
+                print(f"Critical Log Detected!\nSource: {log.source}\nMessage: {log.source.message}\nAnalysis: {analysis}")
+
+        log_service.bulk_mark_analyzed(analyzed)
+
+    if use_batch_api:
+        jobs = [asyncio.ensure_future(_batch(chunk)) for chunk in log_service.get_unanalyzed_logs(page_size=chunk_size)]
+        for job in asyncio.as_completed(jobs):
+            _flush(await job)
+        return
+
+    for chunk in log_service.get_unanalyzed_logs(page_size=chunk_size):
+        _flush(await asyncio.gather(*[_one(log) for log in chunk]))
+
+async def analyze_logs():
+    print("Analyzing logs...")
+    # slack_notifier = SlackNotifier()
+    await process_all(ai_service, log_service, use_batch_api=USE_BATCH_API)
 
 if __name__ == "__main__":
     print("Starting log analyzer job...")
-    analyze_logs()  # Run once immediately
-    scheduler = BlockingScheduler()
-    scheduler.add_job(analyze_logs, 'interval', minutes=5)
-    scheduler.start()
\ No newline at end of file
+    # Run on one event loop so the AI service and its clients are reused
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    scheduler = AsyncIOScheduler(event_loop=loop)
+    if USE_BATCH_API:
+        scheduler.add_job(analyze_logs, 'cron', hour=2)
+    else:
+        # A Batch API run can wait up to 24h, so only realtime mode runs at startup
+        scheduler.add_job(analyze_logs, 'interval', minutes=5, next_run_time=datetime.now())
+    scheduler.start()
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(ai_service.aclose())
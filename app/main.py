@@ -1,12 +1,17 @@
-from fastapi import FastAPI, Request, Body
+from fastapi import FastAPI, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from app.services.log_service import LogService
-from app.repositories.log_repository import LogRepository
-from app.models.log_model import ElkLog, LogDocument
+from app.services.async_log_service import AsyncLogService
+from app.repositories.async_log_repository import AsyncLogRepository
+from app.models.log_model import (
+    ElkLog, LogDocument, PromptWithLogs,
+    BatchSubmitResponse, BatchAnalysisResponse, PromptAnalysisResponse
+)
 from app.utils.setup_static import setup_static_directory
 from app.services.ai_service import AIService
+from app.services.cached_ai_service import CachedAIService
 from dotenv import load_dotenv
 import os
 from typing import List, Optional
@@ -15,7 +20,10 @@ from uuid import uuid4
 import logging
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import httpx
 import json
+from pydantic import TypeAdapter, ValidationError
 
 # Set up logging configuration
 logging.basicConfig(
@@ -29,7 +37,16 @@ load_dotenv()
 # Print for debugging
 print(f"OpenAI API Key: {os.getenv('OPENAI_API_KEY', 'Not found')[:10]}...")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare MongoDB, then close the pooled HTTP client and services on shutdown"""
+    await log_repository.ensure_indexes()
+    yield
+    await ai_service.aclose()
+    await http_client.aclose()
+    await log_service.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -50,17 +67,41 @@ app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
 
 # Initialize dependencies
-log_repository = LogRepository(
+log_repository = AsyncLogRepository(
     db_uri=os.getenv("MONGODB_URI"),
     db_name="logs_db",
     collection_name="logs"
 )
-log_service = LogService(log_repository)
-ai_service = AIService(api_key=os.getenv("OPENAI_API_KEY"))
+log_service = AsyncLogService(log_repository)
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32)
+)
+if os.getenv("REDIS_URL"):
+    ai_service = CachedAIService(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        redis_url=os.getenv("REDIS_URL"),
+        http_client=http_client
+    )
+else:
+    ai_service = AIService(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
 
 # Add after existing imports
 logger = logging.getLogger(__name__)
 
+# Parse request bodies straight from JSON bytes in a single pydantic-core pass
+ELK_LOG_LIST = TypeAdapter(List[ElkLog])
+PROMPT_WITH_LOGS = TypeAdapter(PromptWithLogs)
+
+def parse_json_body(body: bytes, adapter: TypeAdapter):
+    """Validate a raw JSON body, reporting failures as a 422 like FastAPI does"""
+    try:
+        return adapter.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+
 @app.get("/")
 async def root(request: Request):
     """Render the welcome page with file upload interface"""
@@ -80,9 +121,10 @@ async def root(request: Request):
         }
     )
 
-@app.post("/receive-logs")
-async def receive_logs(logs: List[ElkLog]):
+@app.post("/receive-logs", response_model_exclude_none=True)
+async def receive_logs(request: Request) -> BatchSubmitResponse:
     """Process logs and store analysis"""
+    logs = parse_json_body(await request.body(), ELK_LOG_LIST)
     try:
         batch_id = await log_service.analyze_and_save_batch(logs, ai_service)
         if batch_id:
@@ -96,16 +138,16 @@ async def receive_logs(logs: List[ElkLog]):
         logger.error(f"Error processing logs: {e}")
         return {"error": str(e)}
 
-@app.get("/analyze/{batch_id}")
-async def get_analysis(batch_id: str):
+@app.get("/analyze/{batch_id}", response_model_exclude_none=True)
+async def get_analysis(batch_id: str) -> BatchAnalysisResponse:
     """Get analysis results as JSON"""
     try:
-        batch = log_service.get_batch_analysis(batch_id)
+        batch = await log_service.get_batch_analysis(batch_id)
         if not batch:
             return {"error": "Analysis not found"}
 
         return {
-            "timestamp": batch.timestamp.isoformat(),
+            "timestamp": batch.timestamp,
             "total_errors": batch.total_errors,
             "analyses": [
                 {
@@ -130,8 +172,8 @@ async def get_analysis(batch_id: str):
         print(f"Error getting analysis: {e}")
         return {"error": str(e)}
 
-@app.post("/analyze-prompt")
-async def analyze_prompt(request: Request):
+@app.post("/analyze-prompt", response_model_exclude_none=True)
+async def analyze_prompt(request: Request) -> Optional[PromptAnalysisResponse]:
     """Analyze custom prompt and return AI response"""
     try:
         body = await request.json()
@@ -156,7 +198,7 @@ async def analyze_prompt(request: Request):
                 formatted_analysis = str(analysis)
             
             return {
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": datetime.utcnow(),
                 "analysis": formatted_analysis
             }
             
@@ -172,28 +214,12 @@ def get_request_type(generic_message, elk_logs):
         return f"ELK Logs ({len(elk_logs)} logs)"
     return "Context-based"
 
-@app.post("/analyze-prompt-with-logs")
-async def analyze_prompt_with_logs(
-    request: Request,
-    logs: List[ElkLog] = Body(..., embed=True),
-    prompt: str = Body(..., embed=True)
-):
+@app.post("/analyze-prompt-with-logs", response_model_exclude_none=True)
+async def analyze_prompt_with_logs(request: Request) -> BatchSubmitResponse:
     """Analyze custom prompt with ELK logs"""
+    payload = parse_json_body(await request.body(), PROMPT_WITH_LOGS)
+    logs, prompt = payload.logs, payload.prompt
     try:
-        # Create context from logs
-        logs_context = {
-            "logs": [
-                {
-                    "message": log.source.message,
-                    "timestamp": log.source.timestamp.isoformat(),
-                    "level": log.source.msg.level_name,
-                    "file": log.source.log.get("file", {}).get("path", "Unknown"),
-                    "elk_id": log.elk_id
-                }
-                for log in logs
-            ]
-        }
-        
         # Analyze with AI and save batch
         batch_id = await log_service.analyze_and_save_batch(logs, ai_service, custom_prompt=prompt)
         
@@ -1,6 +1,11 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
+from functools import cached_property
 from typing import Optional, Dict, List, Any
+import orjson
+
+# Shared config for the ELK-side models, which are created in bulk per request
+ELK_MODEL_CONFIG = ConfigDict(frozen=True, extra="ignore", populate_by_name=True)
 
 class Agent(BaseModel):
     ephemeral_id: str
@@ -9,6 +14,8 @@ class Agent(BaseModel):
     type: str
     version: str
 
+    model_config = ELK_MODEL_CONFIG
+
 class Host(BaseModel):
     id: str
     hostname: str
@@ -19,42 +26,76 @@ class Host(BaseModel):
     ip: List[str]
     os: Dict[str, str]
 
+    model_config = ELK_MODEL_CONFIG
+
 class MessageLevel(BaseModel):
     level_name: str
     level: int
 
+    model_config = ELK_MODEL_CONFIG
+
 class LogFile(BaseModel):
     path: str
     offset: int
 
+    model_config = ELK_MODEL_CONFIG
+
 class LogSource(BaseModel):
-    agent: Agent
-    timestamp: datetime = Field(alias="@timestamp")
+    """`_source` of an ELK hit.
+
+    Covers both the Filebeat shape (agent/host/msg...) and the Laravel shape
+    (level_name/event.original), so every field but `message` is optional.
+    """
+    agent: Optional[Agent] = None
+    timestamp: Optional[datetime] = Field(default=None, alias="@timestamp")
     message: str
-    fields: Dict[str, str]
-    version: str = Field(alias="@version")
-    host: Host
-    msg: MessageLevel
-    input: Dict[str, str]
-    tags: List[str]
-    ecs: Dict[str, str]
-    log: Dict[str, Any]
-    type: str
+    fields: Optional[Dict[str, str]] = None
+    version: Optional[str] = Field(default=None, alias="@version")
+    host: Optional[Host] = None
+    msg: Optional[MessageLevel] = None
+    input: Optional[Dict[str, str]] = None
+    tags: Optional[List[str]] = None
+    ecs: Optional[Dict[str, str]] = None
+    log: Optional[Dict[str, Any]] = None
+    type: Optional[str] = None
+    level_name: Optional[str] = None
+    event: Optional[Dict[str, Any]] = None
+
+    # Keep unknown ELK fields so stored documents stay complete
+    model_config = ConfigDict(**{**ELK_MODEL_CONFIG, "extra": "allow"})
+
+    @property
+    def level(self) -> Optional[str]:
+        """Level name from whichever source shape is present"""
+        return self.msg.level_name if self.msg else self.level_name
 
 class ElkLog(BaseModel):
     index: str = Field(alias="_index")
     id: str = Field(alias="_id")
     score: float = Field(default=0.0, alias="_score")
     ignored: Optional[List[str]] = Field(default=None, alias="_ignored")
-    source: dict = Field(alias="_source")
+    source: LogSource = Field(alias="_source")
     fields: Optional[dict] = None
     elk_id: Optional[int] = None
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {
+    model_config = ConfigDict(
+        **ELK_MODEL_CONFIG,
+        json_encoders={
             datetime: lambda v: v.isoformat()
         }
+    )
+
+    @cached_property
+    def event_parsed(self) -> Optional[Dict[str, Any]]:
+        """`_source.event.original` decoded on first use; never stored or serialized"""
+        original = (self.source.event or {}).get("original")
+        if not isinstance(original, (str, bytes)):
+            return None
+        try:
+            parsed = orjson.loads(original)
+        except orjson.JSONDecodeError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
 
 class AIAnalysis(BaseModel):
     timestamp: str
@@ -88,7 +129,7 @@ class ErrorLog(BaseModel):
 
 class LogDocument(BaseModel):
     id: str = Field(alias="_id")
-    source: LogSource
+    source: LogSource = Field(alias="_source")
     errors: List[ErrorLog] = []
     last_analyzed: Optional[datetime] = None
     total_errors: int = 0
@@ -139,4 +180,27 @@ class BatchResult(BaseModel):
 
     model_config = {
         "populate_by_name": True
-    }
\ No newline at end of file
+    }
+
+class PromptWithLogs(BaseModel):
+    logs: List[ElkLog]
+    prompt: str
+
+# API responses; declared so FastAPI serializes them straight to JSON bytes.
+# Fields are optional because each endpoint also reports failures as {"error": ...}.
+class BatchSubmitResponse(BaseModel):
+    message: Optional[str] = None
+    batch_id: Optional[str] = None
+    elk_ids: Optional[List[int]] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    timestamp: Optional[datetime] = None
+    total_errors: Optional[int] = None
+    analyses: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+class PromptAnalysisResponse(BaseModel):
+    timestamp: Optional[datetime] = None
+    analysis: Optional[str] = None
+    error: Optional[str] = None
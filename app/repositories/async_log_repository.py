@@ -0,0 +1,85 @@
+from bson import ObjectId
+from typing import List, Optional
+from datetime import datetime
+from app.models.log_model import ElkLog, BatchAnalysis, AnalysisBatch
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.repositories.log_repository import LOG_INDEXES, PYDANTIC_TYPE_REGISTRY
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncLogRepository:
+    """Motor-backed counterpart of LogRepository for the FastAPI endpoints.
+
+    The scheduler jobs keep using the synchronous LogRepository.
+    """
+
+    def __init__(self, db_uri: str, db_name: str, collection_name: str):
+        self.client = AsyncIOMotorClient(db_uri, type_registry=PYDANTIC_TYPE_REGISTRY)
+        self.db = self.client[db_name]
+        self.collection = self.db[collection_name]
+
+    async def ensure_indexes(self):
+        """Create the indexes LogRepository maintains (idempotent)"""
+        await self.collection.create_indexes(LOG_INDEXES)
+
+    async def save_batch_analysis(self, logs: List[ElkLog], analyses: List[dict], request_id: str) -> str:
+        """Save all logs and analyses in a single document"""
+        batch_doc = {
+            "type": "batch_analysis",
+            "timestamp": datetime.utcnow(),
+            "request_id": request_id,
+            "logs": logs,  # Encoded by the Pydantic fallback encoder
+            "analysis_results": analyses,
+            "total_errors": len(logs),
+            "critical_errors": sum(log.source.level == "ERROR" for log in logs),
+        }
+
+        result = await self.collection.insert_one(batch_doc)
+        return str(result.inserted_id)
+
+    async def get_batch_analysis(self, batch_id: str) -> Optional[BatchAnalysis]:
+        """Get analysis for a specific batch"""
+        if not ObjectId.is_valid(batch_id):
+            return None
+
+        try:
+            doc = await self.collection.find_one({
+                "_id": ObjectId(batch_id),
+                "type": "batch_analysis"
+            })
+            if not doc:
+                return None
+
+            doc["_id"] = str(doc["_id"])
+            return BatchAnalysis(**doc)
+        except Exception as e:
+            logger.error("Error fetching batch analysis: %s", e, exc_info=True)
+            return None
+
+    async def save_batch(self, logs: List[ElkLog], analyses: List[dict]) -> str:
+        """Save logs and their analyses in a single document"""
+        doc = {
+            "timestamp": datetime.utcnow(),
+            "logs": logs,
+            "analyses": analyses,  # Store the raw AI analyses as they come
+            "total_errors": len(logs)
+        }
+
+        result = await self.collection.insert_one(doc)
+        return str(result.inserted_id)
+
+    async def get_batch(self, batch_id: str) -> Optional[AnalysisBatch]:
+        """Get a batch by ID"""
+        if not ObjectId.is_valid(batch_id):
+            return None
+
+        try:
+            doc = await self.collection.find_one({"_id": ObjectId(batch_id)})
+            if doc:
+                doc["_id"] = str(doc["_id"])
+                return AnalysisBatch(**doc)
+            return None
+        except Exception as e:
+            logger.error("Error getting batch: %s", e)
+            return None
@@ -1,44 +1,121 @@
 from bson import ObjectId
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from datetime import datetime, timedelta
 from app.models.log_model import ElkLog, LogDocument, ErrorLog, BatchAnalysis, BatchResult, AnalysisBatch
-from pymongo import MongoClient, ASCENDING, IndexModel
+from pymongo import MongoClient, ASCENDING, DESCENDING, IndexModel, UpdateOne
+from bson.codec_options import TypeRegistry
+from pydantic import BaseModel, ValidationError
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _encode_pydantic(value):
+    """BSON fallback encoder so Pydantic models can be embedded in documents directly.
+
+    Unset optional fields are left out rather than stored as nulls.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True, exclude_none=True)
+    return value
+
+PYDANTIC_TYPE_REGISTRY = TypeRegistry(fallback_encoder=_encode_pydantic)
+
+# Fields needed to analyze a log; skips the rest of the nested _source tree
+UNANALYZED_LOG_PROJECTION = {
+    "_id": 1,
+    "_index": 1,
+    "elk_id": 1,
+    "_source.@timestamp": 1,
+    "_source.message": 1,
+    "_source.msg": 1,
+    "_source.level_name": 1,
+    "_source.event": 1
+}
+
+# Fields needed to build a LogDocument summary
+LOG_DOCUMENT_PROJECTION = {
+    "_id": 1,
+    "_source.@timestamp": 1,
+    "_source.message": 1,
+    "_source.msg": 1,
+    "_source.level_name": 1,
+    "_source.host": 1,
+    "errors": 1,
+    "last_analyzed": 1,
+    "total_errors": 1,
+    "critical_errors": 1
+}
+
+# Indexes on the logs collection, shared with AsyncLogRepository.ensure_indexes
+LOG_INDEXES = [
+    # Deduplicates raw ELK logs
+    IndexModel(
+        [("_source.@timestamp", ASCENDING), ("_source.message", ASCENDING)],
+        unique=True,
+        partialFilterExpression={
+            "_source.@timestamp": {"$exists": True},
+            "_source.message": {"$exists": True}
+        }
+    ),
+    # Batch analysis lookups and per-host error summaries
+    IndexModel([("type", ASCENDING), ("request_id", ASCENDING)]),
+    IndexModel([("_source.host.hostname", ASCENDING), ("_source.@timestamp", DESCENDING)])
+]
 
 class LogRepository:
-    def __init__(self, db_uri: str, db_name: str, collection_name: str):
-        self.client = MongoClient(db_uri)
+    # Collections whose indexes were already ensured in this process
+    _indexed_collections = set()
+
+    def __init__(self, db_uri: str, db_name: str, collection_name: str, **client_options):
+        self.client = MongoClient(db_uri, type_registry=PYDANTIC_TYPE_REGISTRY, **client_options)
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
-        
+
+        index_key = (db_uri, db_name, collection_name)
+        if index_key not in LogRepository._indexed_collections:
+            self._ensure_indexes()
+            LogRepository._indexed_collections.add(index_key)
+
+    def _ensure_indexes(self):
         # Drop existing index if exists
         try:
             self.collection.drop_index("_source.@timestamp_1__source.message_1")
         except:
             pass
 
-        # Create new index with partial filter
-        self.collection.create_index(
-            [
-                ("_source.@timestamp", ASCENDING),
-                ("_source.message", ASCENDING)
-            ],
-            unique=True,
-            partialFilterExpression={
-                "_source.@timestamp": {"$exists": True},
-                "_source.message": {"$exists": True}
-            }
+        self.collection.create_indexes(LOG_INDEXES)
+
+    @classmethod
+    def for_ingest(cls, db_uri: str, db_name: str, collection_name: str) -> "LogRepository":
+        """Repository tuned for high-volume ingest: unacknowledged writes and wire compression.
+
+        Only use this where losing a write is acceptable; analysis writes keep the default w=1.
+        """
+        return cls(
+            db_uri,
+            db_name,
+            collection_name,
+            w=0,
+            compressors="zstd",
+            maxPoolSize=50
         )
 
     def log_exists(self, timestamp: datetime, message: str) -> bool:
         """Check if log already exists"""
-        return self.collection.count_documents({
-            "_source.@timestamp": timestamp,
-            "_source.message": message
-        }) > 0
-
-    def save_log(self, log: ElkLog) -> str:
-        """Save log with upsert to avoid duplicates"""
-        log_dict = log.model_dump(exclude={'id'})
+        return self.collection.find_one(
+            {
+                "_source.@timestamp": timestamp,
+                "_source.message": message
+            },
+            projection={"_id": 1}
+        ) is not None
+
+    def save_log(self, log: ElkLog) -> Optional[str]:
+        """Save log with upsert to avoid duplicates.
+
+        Returns the new document id, or None if the log was already stored.
+        """
+        log_dict = log.model_dump(by_alias=True, exclude={'id'}, exclude_none=True)
         result = self.collection.update_one(
             {
                 "_source.@timestamp": log.source.timestamp,
@@ -49,9 +126,66 @@ class LogRepository:
         )
         return str(result.upserted_id) if result.upserted_id else None
 
-    def get_unanalyzed_logs(self) -> List[ElkLog]:
-        logs = self.collection.find({"analyzed": True})
-        return [ElkLog(**{**log, "_id": str(log["_id"])}) for log in logs]
+    def bulk_upsert_logs(self, logs: List[ElkLog]) -> Optional[int]:
+        """Upsert many logs in a single round-trip, skipping duplicates.
+
+        Returns the number of new logs, or None for unacknowledged (w=0) writes.
+        """
+        if not logs:
+            return 0
+
+        operations = [
+            UpdateOne(
+                {
+                    "_source.@timestamp": log.source.timestamp,
+                    "_source.message": log.source.message
+                },
+                {"$setOnInsert": log.model_dump(by_alias=True, exclude={'id'}, exclude_none=True)},
+                upsert=True
+            )
+            for log in logs
+        ]
+        # pymongo rejects bypass_document_validation on unacknowledged (w=0) writes
+        result = self.collection.bulk_write(
+            operations,
+            ordered=False,
+            bypass_document_validation=self.collection.write_concern.acknowledged
+        )
+        return result.upserted_count if result.acknowledged else None
+
+    def get_unanalyzed_logs(self, page_size: int = 100) -> Iterator[List[ElkLog]]:
+        """Yield pages of logs that have not been analyzed yet, in `_id` order.
+
+        Batch and summary documents share the collection, so only raw ELK log
+        documents (those with an ELK `_index`) are queried; any that still fail
+        validation are skipped. Each page is a separate query resuming after the
+        last `_id` seen, so no server cursor is held while the caller processes
+        a page (idle cursors time out after 10 minutes). Logs left unanalyzed
+        by the caller are not revisited until the next call.
+        """
+        query = {"analyzed": {"$ne": True}, "_index": {"$exists": True}}
+        last_id = None
+        while True:
+            if last_id is not None:
+                query = {**query, "_id": {"$gt": last_id}}
+            docs = list(
+                self.collection.find(query, projection=UNANALYZED_LOG_PROJECTION)
+                .sort("_id", ASCENDING)
+                .limit(page_size)
+                .batch_size(page_size)
+            )
+            if not docs:
+                return
+
+            page = []
+            for doc in docs:
+                try:
+                    page.append(ElkLog(**{**doc, "_id": str(doc["_id"])}))
+                except ValidationError as e:
+                    logger.warning("Skipping invalid log document %s: %s", doc["_id"], e)
+            if page:
+                yield page
+            last_id = docs[-1]["_id"]
 
     def update_log(self, log_id: str, update_data: dict):
         self.collection.update_one(
@@ -59,10 +193,16 @@ class LogRepository:
             {"$set": update_data}
         )
 
+    def bulk_update(self, operations: List[UpdateOne]) -> int:
+        """Apply many update operations in a single round-trip"""
+        if not operations:
+            return 0
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
     def update_log_analysis(self, log_id: str, analysis: dict):
         """Store AI analysis results"""
-        print(f"Storing analysis for log {log_id}")
-        print(f"Analysis data: {analysis}")
+        logger.debug("Storing analysis for log %s: %r", log_id, analysis)
         
         update_data = {
             "analyzed": True,
@@ -80,27 +220,21 @@ class LogRepository:
             {"$set": update_data}
         )
         
-        print(f"Update result: matched={result.matched_count}, modified={result.modified_count}")
-        
-        # Verify the update
-        updated_doc = self.collection.find_one({"_id": ObjectId(log_id)})
-        print(f"Updated document: {updated_doc}")
+        logger.debug("Update result: matched=%d, modified=%d", result.matched_count, result.modified_count)
 
     def get_analyzed_logs(self) -> List[LogDocument]:
         """Get all analyzed logs"""
-        # Add count of all documents
-        total_docs = self.collection.count_documents({})
-        print(f"Total documents in collection: {total_docs}")
-        
-        # Add count of analyzed documents
-        analyzed_count = self.collection.count_documents({"errors": {"$exists": True, "$ne": []}})
-        print(f"Total documents with errors: {analyzed_count}")
-        
-        logs = self.collection.find({"errors": {"$exists": True, "$ne": []}}).sort("last_analyzed", -1)
-        return [LogDocument(**log) for log in logs]
+        logs = self.collection.find(
+            {"errors": {"$exists": True, "$ne": []}},
+            projection=LOG_DOCUMENT_PROJECTION
+        ).sort("last_analyzed", -1)
+        return [LogDocument(**{**log, "_id": str(log["_id"])}) for log in logs]
 
     def get_analyzed_log(self, log_id: str) -> Optional[LogDocument]:
         """Get a single analyzed log by ID"""
+        if not ObjectId.is_valid(log_id):
+            return None
+
         log = self.collection.find_one({
             "_id": ObjectId(log_id),
             "errors": {"$exists": True, "$ne": []}
@@ -113,11 +247,17 @@ class LogRepository:
         return LogDocument(**log)
 
     def save_error_and_analysis(self, log: ElkLog, analysis: dict) -> str:
-        """Save error and its analysis in the document"""
+        """Save error and its analysis in the document for the log's host and day.
+
+        Only Filebeat-shaped logs carry the host and timestamp this needs.
+        """
+        if log.source.host is None or log.source.timestamp is None:
+            raise ValueError(f"Log {log.id} has no host or @timestamp to file its error under")
+
         error_log = {
             "timestamp": log.source.timestamp,
             "message": log.source.message,
-            "level": log.source.msg.level_name,
+            "level": log.source.level,
             "host": log.source.host.hostname,
             "analysis": {
                 "timestamp": analysis["timestamp"],
@@ -130,26 +270,26 @@ class LogRepository:
             }
         }
 
-        # Update or create document
+        # Update or create the document for this host and day
+        day_start = log.source.timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+        now = datetime.utcnow()
         result = self.collection.update_one(
             {
                 "_source.host.hostname": log.source.host.hostname,
-                "_source.@timestamp": {
-                    "$gte": log.source.timestamp.replace(hour=0, minute=0, second=0),
-                    "$lt": (log.source.timestamp.replace(hour=0, minute=0, second=0) + timedelta(days=1))
-                }
+                "_source.@timestamp": {"$gte": day_start, "$lt": day_end}
             },
             {
                 "$push": {"errors": error_log},
                 "$inc": {
                     "total_errors": 1,
-                    "critical_errors": 1 if log.source.msg.level_name == "ERROR" else 0
+                    "critical_errors": 1 if log.source.level == "ERROR" else 0
                 },
                 "$set": {
-                    "last_analyzed": datetime.utcnow(),
-                    "_source": log.model_dump(exclude={'id'})["source"]
+                    "last_analyzed": now,
+                    "_source": log.source
                 },
-                "$setOnInsert": {"created_at": datetime.utcnow()}
+                "$setOnInsert": {"created_at": now}
             },
             upsert=True
         )
@@ -167,76 +307,80 @@ class LogRepository:
                 "$gte": datetime.utcnow() - timedelta(days=days)
             }
 
-        documents = self.collection.find(query).sort("last_analyzed", -1)
-        return [LogDocument(**doc) for doc in documents]
+        documents = self.collection.find(query, projection=LOG_DOCUMENT_PROJECTION).sort("last_analyzed", -1)
+        return [LogDocument(**{**doc, "_id": str(doc["_id"])}) for doc in documents]
+
+    def get_error_summary_agg(self, host: Optional[str] = None, days: int = 1) -> List[dict]:
+        """Get per-host error counts, aggregated server-side"""
+        query = {}
+        if host:
+            query["_source.host.hostname"] = host
+        
+        if days:
+            query["_source.@timestamp"] = {
+                "$gte": datetime.utcnow() - timedelta(days=days)
+            }
+
+        pipeline = [
+            {"$match": query},
+            {"$group": {
+                "_id": "$_source.host.hostname",
+                "total": {"$sum": "$total_errors"},
+                "critical": {"$sum": "$critical_errors"}
+            }}
+        ]
+        return list(self.collection.aggregate(pipeline))
 
     def save_batch_analysis(self, logs: List[ElkLog], analyses: List[dict], request_id: str) -> str:
         """Save all logs and analyses in a single document"""
-        print(f"Saving batch analysis with request ID: {request_id}")
-        
+        logger.debug("Saving batch analysis with request ID: %s", request_id)
+
         batch_doc = {
             "type": "batch_analysis",
             "timestamp": datetime.utcnow(),
             "request_id": request_id,
-            "logs": [log.model_dump() for log in logs],
+            "logs": logs,  # Encoded by the Pydantic fallback encoder
             "analysis_results": analyses,
             "total_errors": len(logs),
-            "critical_errors": sum(1 for log in logs if log.source.msg.level_name == "ERROR"),
+            "critical_errors": sum(log.source.level == "ERROR" for log in logs),
         }
         
-        print(f"Document to insert: {batch_doc}")
         result = self.collection.insert_one(batch_doc)
         inserted_id = str(result.inserted_id)
-        print(f"Inserted document with ID: {inserted_id}")
-        
-        # Verify the insert
-        saved_doc = self.collection.find_one({"_id": result.inserted_id})
-        print(f"Saved document: {saved_doc}")
-        
+        logger.debug("Inserted batch analysis with ID: %s", inserted_id)
         return inserted_id
 
     def get_batch_analysis(self, batch_id: str) -> Optional[BatchAnalysis]:
         """Get analysis for a specific batch"""
+        if not ObjectId.is_valid(batch_id):
+            return None
+
         try:
-            print(f"Looking for batch with ID: {batch_id}")
-            
-            # First check if document exists at all
-            doc = self.collection.find_one({"_id": ObjectId(batch_id)})
-            if not doc:
-                print("No document found with this ID")
-                return None
-            
-            print(f"Found document: {doc}")
-            
-            # Now check with type filter
             doc = self.collection.find_one({
                 "_id": ObjectId(batch_id),
                 "type": "batch_analysis"
             })
             
             if not doc:
-                print("Document exists but is not a batch analysis")
+                logger.debug("No batch analysis found with ID: %s", batch_id)
                 return None
             
-            print("Converting document to BatchAnalysis")
             doc["_id"] = str(doc["_id"])
             return BatchAnalysis(**doc)
             
         except Exception as e:
-            print(f"Error fetching batch analysis: {str(e)}")
-            print(f"Error type: {type(e)}")
-            import traceback
-            print(traceback.format_exc())
+            logger.error("Error fetching batch analysis: %s", e, exc_info=True)
             return None
 
     def save_analysis_batch(self, logs: List[ElkLog], analyses: List[dict]) -> str:
         """Save logs with their AI analysis"""
+        now = datetime.utcnow()
         doc = {
-            "timestamp": datetime.utcnow(),
+            "timestamp": now,
             "analyses": [
                 {
-                    "timestamp": datetime.utcnow(),
-                    "log": log.model_dump(),
+                    "timestamp": now,
+                    "log": log,
                     "error_message": analysis["error_message"],
                     "analysis": analysis["analysis"],
                     "suggestions": analysis["suggestions"],
@@ -253,6 +397,9 @@ class LogRepository:
 
     def get_analysis(self, batch_id: str) -> Optional[BatchResult]:
         """Get analysis results"""
+        if not ObjectId.is_valid(batch_id):
+            return None
+
         doc = self.collection.find_one({"_id": ObjectId(batch_id)})
         if doc:
             doc["_id"] = str(doc["_id"])
@@ -263,7 +410,7 @@ class LogRepository:
         """Save logs and their analyses in a single document"""
         doc = {
             "timestamp": datetime.utcnow(),
-            "logs": [log.model_dump() for log in logs],
+            "logs": logs,
             "analyses": analyses,  # Store the raw AI analyses as they come
             "total_errors": len(logs)
         }
@@ -273,6 +420,9 @@ class LogRepository:
 
     def get_batch(self, batch_id: str) -> Optional[AnalysisBatch]:
         """Get a batch by ID"""
+        if not ObjectId.is_valid(batch_id):
+            return None
+
         try:
             doc = self.collection.find_one({"_id": ObjectId(batch_id)})
             if doc:
@@ -280,7 +430,7 @@ class LogRepository:
                 return AnalysisBatch(**doc)
             return None
         except Exception as e:
-            print(f"Error getting batch: {e}")
+            logger.error("Error getting batch: %s", e)
             return None
 
     def get_latest_with_response(self):
@@ -292,5 +442,5 @@ class LogRepository:
                 "response": {"$exists": True}
             }).sort("created_at", -1)
         except Exception as e:
-            print(f"Error fetching latest log with response: {str(e)}")
+            logger.error("Error fetching latest log with response: %s", e)
             return None
\ No newline at end of file
@@ -1,138 +1,485 @@
-from openai import OpenAI
-from typing import List, Dict
+from openai import AsyncOpenAI, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from typing import List, Dict, Optional
 from app.models.log_model import ElkLog
-import json
+import orjson
 import re
 import logging
 from datetime import datetime
+import asyncio
+import httpx
+import os
 
 # Add after imports
 logger = logging.getLogger(__name__)
 
+# Number of logs analyzed together in a single bulk prompt; kept small so the
+# reply fits in BULK_MAX_TOKENS
+BULK_PROMPT_SIZE = 5
+
+# Completion token cap for a bulk prompt (gpt-4-turbo's maximum)
+BULK_MAX_TOKENS = 4096
+
+# Characters of a log message, and of its serialized event context, sent per log
+CONTEXT_LENGTH = 1500
+
+# Models per analysis tier: a cheap triage pass for every log, the full
+# analysis model only for logs triaged as HIGH severity
+MODEL_TIERS = {
+    "triage": "gpt-4o-mini",
+    "analysis": "gpt-4-turbo-preview"
+}
+
+# Characters of a log message sent to the triage model
+TRIAGE_MESSAGE_LENGTH = 2000
+
+# (sentinels, pattern, formatter) for _extract_error_details; compiled in AIService.__init__.
+# A pattern is only tried when one of its lowercase sentinel substrings occurs in the message.
+# Every match starts with one of its sentinels, so the search begins at the first one found.
+# Captures are bounded to one line of at most 500 characters so a failed match cannot
+# backtrack across the whole message.
+_ERROR_PATTERNS = [
+    # HTTP/API Errors
+    (tuple("0123456789"),
+     r'(?<!\d)(\d{3})\s*(?:error)?\s*[:-]\s*([^\n]{1,500}?)(?=\s+at\s|$)',
+     lambda m: ("HTTP Error", f"Status {m.group(1)}: {m.group(2).strip()}", int(m.group(1)))),
+    
+    # Database Errors
+    (("sqlstate[",),
+     r'SQLSTATE\[(\w+)\][^\n]{0,500}?(?:errno\s*=\s*(\d+))?\s*([^\n]{1,500}?)(?=\s*\(|$)',
+     lambda m: ("Database Error", f"SQL Error {m.group(1)}: {m.group(3).strip()}", 500)),
+    
+    # Authentication Errors
+    (("auth", "permission", "access"),
+     r'(auth\w*\s+failed|permission\s+denied|access\s+denied)([^\n]{1,500}?)(?=\s+at\s|$)',
+     lambda m: ("Authentication Error", m.group(0), 401)),
+    
+    # Connection Errors
+    (("connection", "refused", "time", "couldn't"),
+     r'(connection\s+\w+|refused|timed?\s*out|couldn\'t\s+connect)([^\n]{1,500}?)(?=\s+at\s|$)',
+     lambda m: ("Connection Error", f"Connection failed: {m.group(0)}", 503)),
+    
+    # Application Errors
+    (("exception",),
+     r'exception\s*[\'"]([^\'"\n]{1,500})[\'"][^\n]{0,500}?message\s*[\'"]([^\'"\n]{1,500})[\'"]',
+     lambda m: ("Application Error", f"{m.group(1)}: {m.group(2)}", 500))
+]
+
+# (sentinels, pattern, formatter) for _extract_specific_error; compiled in AIService.__init__
+_SPECIFIC_ERROR_PATTERNS = [
+    # SQL errors
+    (("sqlstate[",),
+     r'SQLSTATE\[(\w+)\][^\n]{0,500}?(?:errno\s*=\s*(\d+))?\s*([^\n]{1,500}?)(?=\s*\(|$)', 
+     lambda m: f"SQL Error {m.group(1)}: {m.group(3).strip()}"),
+    
+    # Laravel exceptions
+    (("exception",),
+     r'exception\s*\'([^\'\n]{1,500})\'\s*with\s*message\s*\'([^\'\n]{1,500})\'',
+     lambda m: f"{m.group(1)}: {m.group(2)}"),
+    
+    # General error patterns
+    (("error:",),
+     r'error:([^\n]{1,500}?)(?=\s+at\s|$)',
+     lambda m: m.group(1).strip()),
+    
+    # Connection errors
+    (("connection", "refused", "time", "couldn't"),
+     r'(connection\s+\w+|refused|timed?\s*out|couldn\'t\s+connect)([^\n]{1,500}?)(?=\s+at\s|$)',
+     lambda m: f"Connection Error: {m.group(0)}"),
+    
+    # Authentication errors
+    (("auth", "permission", "access"),
+     r'(auth\w*\s+failed|permission\s+denied|access\s+denied)([^\n]{1,500}?)(?=\s+at\s|$)',
+     lambda m: f"Authentication Error: {m.group(0)}")
+]
+
+_PRIORITY_LEVELS = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+_WS_RE = re.compile(r'\s+')
+
+# Severity word in a model reply; JSON mode does not enforce the schema, so
+# replies like "High - urgent" or "critical" occur
+_SEVERITY_RE = re.compile(r'\b(CRITICAL|HIGH|MEDIUM|LOW)\b')
+
+def parse_severity(value) -> Optional[str]:
+    """HIGH/MEDIUM/LOW named by a model's severity field (CRITICAL counts as HIGH), or None"""
+    match = _SEVERITY_RE.search(str(value or "").upper())
+    if not match:
+        return None
+    return "HIGH" if match.group(1) == "CRITICAL" else match.group(1)
+
+def _as_list(value) -> list:
+    """A model's list field as a list; a bare string or object becomes one item"""
+    if not value:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+# Timestamps, UUIDs, hex ids and numbers that vary between otherwise identical errors
+_VOLATILE_RE = re.compile(
+    r'\d{4}-\d{2}-\d{2}[T ][\d:.]+(?:Z|[+-]\d{2}:?\d{2})?'
+    r'|\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b'
+    r'|\b0x[0-9a-f]+\b'
+    r'|\b\d+\b',
+    re.IGNORECASE
+)
+
+# Characters of a normalized message that identify an error signature
+SIGNATURE_LENGTH = 400
+
+def normalize_message(message: str) -> str:
+    """Strip volatile tokens so recurring errors compare equal"""
+    return _WS_RE.sub(' ', _VOLATILE_RE.sub('#', message)).strip()
+
+# Event context keys holding the underlying error, most specific first. Laravel
+# logs often carry only a generic message (e.g. "traces") and put the real error here.
+_CONTEXT_ERROR_KEYS = ("exception", "trace", "response", "error")
+
+def context_head(log: ElkLog) -> str:
+    """Normalized HTTP code and first error line from the log's event context"""
+    context = (log.event_parsed or {}).get("context")
+    if not isinstance(context, dict):
+        return ""
+    parts = []
+    if context.get("http_code") is not None:
+        parts.append(f"http {context['http_code']}")
+    for key in _CONTEXT_ERROR_KEYS:
+        value = context.get(key)
+        if value:
+            first_line = str(value).strip().split("\n", 1)[0]
+            parts.append(normalize_message(first_line)[:SIGNATURE_LENGTH])
+            break
+    return " | ".join(parts)
+
+def error_signature(log: ElkLog) -> str:
+    """Canonical signature shared by recurrences of the same error"""
+    message = normalize_message(log.source.message)[:SIGNATURE_LENGTH]
+    return f"{log.source.level}|{message}|{context_head(log)}"
+
+def trimmed_context(log: ElkLog) -> str:
+    """The log's event context as JSON, cut to CONTEXT_LENGTH characters"""
+    context = (log.event_parsed or {}).get("context") or {}
+    return orjson.dumps(context, default=str).decode()[:CONTEXT_LENGTH]
+
+class TruncatedResponseError(Exception):
+    """The model stopped at its token limit, so the reply is incomplete"""
+
 class AIService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        model_tiers: Optional[Dict[str, str]] = None
+    ):
+        # Shares the app-wide connection pool when one is provided. SDK retries are
+        # off so _call_openai's tenacity policy is the only retry layer.
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+        self.model_tiers = {**MODEL_TIERS, **(model_tiers or {})}
+        # Caps in-flight requests across all batches; size it to the account's rate limit tier.
+        # Created on first use so it binds to the running loop (Python < 3.10 binds at construction).
+        self._concurrency = int(os.getenv("OPENAI_CONCURRENCY", "20"))
+        self._sem: Optional[asyncio.Semaphore] = None
+
+        # Compile log-parsing patterns once rather than on every call
+        self._status_re = re.compile(r'status(?:\s+code)?[:=\s]+(\d{3})', re.IGNORECASE)
+        self._error_patterns = [
+            (sentinels, re.compile(p, re.IGNORECASE), fmt) for sentinels, p, fmt in _ERROR_PATTERNS
+        ]
+        self._specific_patterns = [
+            (sentinels, re.compile(p, re.IGNORECASE), fmt) for sentinels, p, fmt in _SPECIFIC_ERROR_PATTERNS
+        ]
+
+    async def aclose(self):
+        """Close the OpenAI client and its HTTP connections"""
+        await self.client.close()
+
+    @retry(
+        # 5xx responses raise InternalServerError; httpx transport errors surface
+        # when a stream breaks after the request opened
+        retry=retry_if_exception_type(
+            (RateLimitError, InternalServerError, APITimeoutError, APIConnectionError, httpx.TransportError)
+        ),
+        wait=wait_exponential_jitter(1, 30),
+        stop=stop_after_attempt(3),
+        reraise=True
+    )
+    async def _call_openai(self, **kwargs) -> str:
+        """Streamed chat completion text, retried on rate limits, 5xx, timeouts and connection errors.
+
+        Tokens are collected as they arrive, so long analyses never sit idle on a
+        buffered response; a stream cut off midway is retried as a whole.
+        """
+        parts = []
+        usage = None
+        finish_reason = None
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._concurrency)
+        async with self._sem:
+            stream = await self.client.chat.completions.create(
+                **kwargs,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                if chunk.choices:
+                    parts.append(chunk.choices[0].delta.content or "")
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                if chunk.usage:
+                    usage = chunk.usage
+        if usage:
+            logger.info(
+                f"OpenAI usage ({kwargs.get('model')}): prompt={usage.prompt_tokens} "
+                f"completion={usage.completion_tokens} total={usage.total_tokens}"
+            )
+        if finish_reason == "length":
+            raise TruncatedResponseError(f"{kwargs.get('model')} reply hit the token limit")
+        return "".join(parts)
+
+    async def _triage(self, log: ElkLog) -> Optional[dict]:
+        """Classify a log with the triage model; None if the reply is unusable"""
+        prompt = f"""
+        Classify this error log. Respond ONLY with a JSON object with these keys:
+        severity (HIGH/MEDIUM/LOW), error_type.
 
-    def analyze_log(self, log: ElkLog) -> dict:
-        """Analyze log and provide detailed analysis with suggestions"""
+        Level: {log.source.level}
+        Message: {log.source.message[:TRIAGE_MESSAGE_LENGTH]}
+        Context: {trimmed_context(log)}
+        """
+        content = await self._call_openai(
+            model=self.model_tiers["triage"],
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        try:
+            data = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return None
+        severity = parse_severity(data.get("severity"))
+        if severity is None:
+            return None
+        return {"severity": severity, "error_type": data.get("error_type")}
+
+    async def analyze_log(self, log: ElkLog) -> dict:
+        """Analyze log and provide detailed analysis with suggestions.
+
+        The triage model answers for MEDIUM/LOW logs; HIGH severity and
+        unclassifiable logs are escalated to the full analysis model.
+        """
         try:
-            # Extract error details from event.original if available
-            event_data = {}
             try:
-                event_data = json.loads(log.source.get("event", {}).get("original", "{}"))
-            except json.JSONDecodeError:
-                pass
-
-            # Build the prompt with available information
-            prompt = f"""
-            Analyze this error log and provide a detailed solution. Format your response exactly as follows:
-
-            ERROR DETECTION
-            Type: [Specific error type, e.g., Database Connection Error, API Error, Authentication Error]
-            Status Code: [HTTP status code if applicable, or internal error code]
-            Description: [Brief, clear description of the error]
-            File Location: [Extract or infer the file location from the error message]
-
-            CODE ANALYSIS
-            Problematic Code: [If available, show the problematic code snippet]
-            Suggested Fix: [Provide the corrected code]
-            
-            ANALYSIS
-            Severity: [HIGH/MEDIUM/LOW]
-            Impact: [Brief description of the impact]
-            Root Cause: [Most likely cause of the error]
-
-            RESOLUTION
-            Immediate Actions:
-            - [Action 1]
-            - [Action 2]
-            
-            Long-term Solutions:
-            - [Solution 1]
-            - [Solution 2]
-
-            Log Details:
-            - Message: {log.source.get("message")}
-            - Level: {log.source.get("level_name")}
-            - Error Context: {event_data.get("context", {})}
-            - Timestamp: {event_data.get("datetime") or log.source.get("@timestamp", "Unknown")}
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
-            )
-            
-            analysis = response.choices[0].message.content
-            
-            # Parse the structured response
-            sections = analysis.split('\n')
-            error_info = {}
-            current_section = ""
-            immediate_actions = []
-            resolution_steps = []
-            code_info = {}
-            
-            for line in sections:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                if line.startswith("ERROR DETECTION"):
-                    current_section = "error"
-                elif line.startswith("CODE ANALYSIS"):
-                    current_section = "code"
-                elif line.startswith("ANALYSIS"):
-                    current_section = "analysis"
-                elif line.startswith("RESOLUTION"):
-                    current_section = "resolution"
-                elif line.startswith("Type:") and current_section == "error":
-                    error_info["error_type"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Status Code:") and current_section == "error":
-                    try:
-                        error_info["status_code"] = int(line.split(":", 1)[1].strip())
-                    except:
-                        error_info["status_code"] = 500
-                elif line.startswith("Description:") and current_section == "error":
-                    error_info["error_message"] = line.split(":", 1)[1].strip()
-                elif line.startswith("File Location:") and current_section == "error":
-                    error_info["file_location"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Problematic Code:") and current_section == "code":
-                    code_info["problematic_code"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Suggested Fix:") and current_section == "code":
-                    code_info["suggested_fix"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Severity:") and current_section == "analysis":
-                    error_info["severity"] = line.split(":", 1)[1].strip().upper()
-                elif line.startswith("Impact:") and current_section == "analysis":
-                    error_info["impact"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Root Cause:") and current_section == "analysis":
-                    error_info["root_cause"] = line.split(":", 1)[1].strip()
-                elif line.startswith("-"):
-                    if "Immediate Actions" in current_section:
-                        immediate_actions.append(line.strip("- "))
-                    elif "Long-term Solutions" in current_section:
-                        resolution_steps.append(line.strip("- "))
-            
-            return {
-                "timestamp": datetime.utcnow().isoformat(),
-                "error_type": error_info.get("error_type", "Unknown Error"),
-                "error_message": error_info.get("error_message", log.source.get("message", "")[:150]),
-                "file_location": error_info.get("file_location", "Unknown location"),
-                "problematic_code": code_info.get("problematic_code"),
-                "suggested_fix": code_info.get("suggested_fix"),
-                "status_code": error_info.get("status_code", 500),
-                "severity": error_info.get("severity", "MEDIUM"),
-                "impact": error_info.get("impact", "Unknown impact"),
-                "root_cause": error_info.get("root_cause", "Unknown cause"),
-                "immediate_actions": immediate_actions,
-                "resolution_steps": resolution_steps,
-                "needs_immediate_attention": error_info.get("severity", "MEDIUM") == "HIGH"
-            }
+                triage = await self._triage(log)
+            except Exception as e:
+                logger.warning(f"Triage failed, escalating to full analysis: {e}")
+                triage = None
+            if triage and triage["severity"] != "HIGH":
+                return self._build_analysis(triage, log)
+            return await self._full_analysis(log)
         except Exception as e:
             logger.error(f"Error in analyze_log: {e}")
             raise
 
+    async def _full_analysis(self, log: ElkLog) -> dict:
+        """Analyze a log with the full analysis model, skipping triage"""
+        # Error details from event.original, decoded when the log was loaded
+        event_data = log.event_parsed or {}
+
+        # Build the prompt with available information
+        prompt = f"""
+        Analyze this error log and provide a detailed solution.
+        Respond ONLY with a JSON object with these keys:
+        error_type, status_code, description, file_location, problematic_code,
+        suggested_fix, severity (HIGH/MEDIUM/LOW), impact, root_cause,
+        immediate_actions (list of strings), long_term_solutions (list of strings).
+
+        Log Details:
+        - Message: {log.source.message}
+        - Level: {log.source.level}
+        - Error Context: {event_data.get("context", {})}
+        - Timestamp: {event_data.get("datetime") or log.source.timestamp or "Unknown"}
+        """
+        
+        content = await self._call_openai(
+            model=self.model_tiers["analysis"],
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=0.7
+        )
+        
+        data = orjson.loads(content)
+        return self._build_analysis(data, log)
+
+    async def analyze_logs_bulk(self, logs: List[ElkLog]) -> List[Optional[dict]]:
+        """Analyze logs with one prompt per BULK_PROMPT_SIZE logs.
+
+        Logs missing from a bulk reply, or whose chunk failed, are retried one by
+        one with the full analysis model, never the triage model, so every log
+        gets the same depth of analysis. Results are aligned with `logs`;
+        entries are None where analysis still failed.
+        """
+        chunks = [logs[i:i + BULK_PROMPT_SIZE] for i in range(0, len(logs), BULK_PROMPT_SIZE)]
+        # Concurrency is capped by _call_openai's OPENAI_CONCURRENCY semaphore
+        results = await asyncio.gather(*[self._analyze_chunk(chunk) for chunk in chunks], return_exceptions=True)
+        analyses = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error in analyze_logs_bulk: {result}")
+                analyses.extend([None] * len(chunk))
+            else:
+                analyses.extend(result)
+
+        async def retry_one(log):
+            try:
+                # No triage, so retried logs match their siblings' analysis depth.
+                # Bypasses subclass caching; the caller already checked the cache.
+                return await AIService._full_analysis(self, log)
+            except Exception:
+                return None
+
+        missing = [i for i, analysis in enumerate(analyses) if analysis is None]
+        if missing:
+            logger.warning(f"Retrying {len(missing)} logs missing from bulk replies individually")
+            retried = await asyncio.gather(*[retry_one(logs[i]) for i in missing])
+            for i, analysis in zip(missing, retried):
+                analyses[i] = analysis
+        return analyses
+
+    async def _analyze_chunk(self, logs: List[ElkLog]) -> List[Optional[dict]]:
+        """Analyze a chunk of logs with a single JSON-mode completion"""
+        content = await self._call_openai(**self._chunk_request(logs))
+        return self._parse_chunk(content, logs)
+
+    def _chunk_request(self, logs: List[ElkLog]) -> dict:
+        """Chat completion parameters for analyzing a chunk of logs in one prompt"""
+        summaries = []
+        for index, log in enumerate(logs):
+            event_data = log.event_parsed or {}
+            summaries.append({
+                "id": index,
+                "message": log.source.message[:CONTEXT_LENGTH],
+                "level": log.source.level,
+                "context": trimmed_context(log),
+                "timestamp": event_data.get("datetime") or str(log.source.timestamp or "Unknown")
+            })
+
+        prompt = f"""
+        Analyze each of these error logs and provide a detailed solution for every one.
+        Respond ONLY with a JSON object of the form {{"analyses": [...]}} containing exactly
+        {len(logs)} entries, one per log, each with these keys:
+        id (the log's id), error_type, status_code, description, file_location,
+        problematic_code, suggested_fix, severity (HIGH/MEDIUM/LOW), impact, root_cause,
+        immediate_actions (list of strings), long_term_solutions (list of strings).
+
+        Logs:
+        {orjson.dumps({"logs": summaries}, default=str).decode()}
+        """
+
+        return {
+            "model": self.model_tiers["analysis"],
+            "messages": [{"role": "user", "content": prompt}],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.7,
+            "max_tokens": BULK_MAX_TOKENS
+        }
+
+    def _parse_chunk(self, content: str, logs: List[ElkLog]) -> List[Optional[dict]]:
+        """Align a chunk's JSON reply with its logs; None where an analysis is missing"""
+        data = orjson.loads(content)
+        by_id = {}
+        for item in data.get("analyses", []):
+            if isinstance(item, dict) and isinstance(item.get("id"), int):
+                by_id[item["id"]] = item
+
+        return [
+            self._build_analysis(by_id[index], log) if index in by_id else None
+            for index, log in enumerate(logs)
+        ]
+
+    async def submit_batch_job(
+        self,
+        logs: List[ElkLog],
+        poll_interval: float = 60
+    ) -> List[Optional[dict]]:
+        """Analyze logs through the OpenAI Batch API at half the realtime price.
+
+        Uses the same chunked prompts as analyze_logs_bulk and waits for the
+        batch to finish (up to its 24h window), so it suits scheduled runs where
+        latency does not matter. Results are aligned with `logs`; entries are
+        None where analysis failed.
+        """
+        if not logs:
+            return []
+
+        chunks = [logs[i:i + BULK_PROMPT_SIZE] for i in range(0, len(logs), BULK_PROMPT_SIZE)]
+        requests = b"\n".join(
+            orjson.dumps({
+                "custom_id": f"chunk-{index}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._chunk_request(chunk)
+            })
+            for index, chunk in enumerate(chunks)
+        )
+
+        input_file = await self.client.files.create(file=("logs.jsonl", requests), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted OpenAI batch {batch.id} with {len(chunks)} requests")
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        results = {}
+        if batch.output_file_id:
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                index = int(item["custom_id"].split("-", 1)[1])
+                try:
+                    choice = item["response"]["body"]["choices"][0]
+                    if choice.get("finish_reason") == "length":
+                        raise TruncatedResponseError("reply hit the token limit")
+                    content = choice["message"]["content"]
+                    results[index] = self._parse_chunk(content, chunks[index])
+                except Exception as e:
+                    logger.error(f"Error parsing batch result {item['custom_id']}: {e}")
+        if batch.status != "completed":
+            logger.error(f"OpenAI batch {batch.id} ended with status {batch.status}")
+
+        analyses = []
+        for index, chunk in enumerate(chunks):
+            analyses.extend(results.get(index) or [None] * len(chunk))
+        return analyses
+
+    def _build_analysis(self, data: dict, log: ElkLog) -> dict:
+        """Map a JSON analysis from the model onto the stored analysis format"""
+        severity = parse_severity(data.get("severity")) or "MEDIUM"
+        try:
+            status_code = int(data.get("status_code"))
+        except (TypeError, ValueError):
+            status_code = 500
+
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "error_type": data.get("error_type") or "Unknown Error",
+            "error_message": data.get("description") or log.source.message[:150],
+            "file_location": data.get("file_location") or "Unknown location",
+            "problematic_code": data.get("problematic_code"),
+            "suggested_fix": data.get("suggested_fix"),
+            "status_code": status_code,
+            "severity": severity,
+            "impact": data.get("impact") or "Unknown impact",
+            "root_cause": data.get("root_cause") or "Unknown cause",
+            "immediate_actions": _as_list(data.get("immediate_actions")),
+            "resolution_steps": _as_list(data.get("long_term_solutions")),
+            "needs_immediate_attention": severity == "HIGH"
+        }
+
     def _extract_error_details(self, log: ElkLog) -> dict:
         """Extract structured error details from log message"""
         message = log.source.message
@@ -140,7 +487,7 @@ class AIService:
         try:
             # Try to parse JSON if message is in JSON format
             if message.startswith('{'):
-                data = json.loads(message)
+                data = orjson.loads(message)
                 message = data.get('message', message)
                 status_code = data.get('status_code') or data.get('code')
             else:
@@ -148,36 +495,17 @@ class AIService:
 
             # Extract status code from message if not found in JSON
             if not status_code:
-                status_match = re.search(r'status(?:\s+code)?[:=\s]+(\d{3})', message, re.IGNORECASE)
+                status_match = self._status_re.search(message)
                 if status_match:
                     status_code = int(status_match.group(1))
 
-            # Common error patterns with their types
-            error_patterns = [
-                # HTTP/API Errors
-                (r'(\d{3})(?:\s+)?(?:error)?\s*[:-]\s*(.+?)(?=\s*at\s|$)',
-                 lambda m: ("HTTP Error", f"Status {m.group(1)}: {m.group(2).strip()}", int(m.group(1)))),
-                
-                # Database Errors
-                (r'SQLSTATE\[(\w+)\].*?(?:errno\s*=\s*(\d+))?\s*(.+?)(?=\s*\(|$)',
-                 lambda m: ("Database Error", f"SQL Error {m.group(1)}: {m.group(3).strip()}", 500)),
-                
-                # Authentication Errors
-                (r'(auth\w*\s+failed|permission\s+denied|access\s+denied)(.+?)(?=\s*at\s|$)',
-                 lambda m: ("Authentication Error", m.group(0), 401)),
-                
-                # Connection Errors
-                (r'(connection\s+\w+|refused|timed?\s*out|couldn\'t\s+connect)(.+?)(?=\s*at\s|$)',
-                 lambda m: ("Connection Error", f"Connection failed: {m.group(0)}", 503)),
-                
-                # Application Errors
-                (r'exception\s*[\'"](.+?)[\'"].*?message\s*[\'"](.+?)[\'"]',
-                 lambda m: ("Application Error", f"{m.group(1)}: {m.group(2)}", 500))
-            ]
-
-            # Try each pattern
-            for pattern, formatter in error_patterns:
-                match = re.search(pattern, message, re.IGNORECASE)
+            # Try each pattern whose sentinel occurs in the message
+            message_lc = message.lower()
+            for sentinels, pattern, formatter in self._error_patterns:
+                start = self._sentinel_start(message, message_lc, sentinels)
+                if start is None:
+                    continue
+                match = pattern.search(message, start)
                 if match:
                     error_type, error_message, default_status = formatter(match)
                     return {
@@ -187,7 +515,7 @@ class AIService:
                     }
 
             # Default case - clean up message
-            cleaned = re.sub(r'\s+', ' ', message).strip()
+            cleaned = _WS_RE.sub(' ', message).strip()
             return {
                 "error_type": "Unknown Error",
                 "error_message": cleaned[:150] + ('...' if len(cleaned) > 150 else ''),
@@ -202,88 +530,36 @@ class AIService:
                 "status_code": 500
             }
 
-    def _parse_analysis(self, analysis: str) -> dict:
-        """Parse AI analysis into structured format"""
-        severity = "MEDIUM"
-        impact = ""
-        immediate_actions = []
-        resolution_steps = []
-        
-        sections = analysis.split('\n')
-        current_section = ""
-        
-        for line in sections:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Extract severity
-            if "severity" in line.lower():
-                if "high" in line.lower():
-                    severity = "HIGH"
-                elif "low" in line.lower():
-                    severity = "LOW"
-                
-            # Extract impact
-            elif "impact" in line.lower():
-                impact = line.split(":", 1)[1].strip() if ":" in line else line
-                
-            # Collect actions and steps
-            elif line.startswith("-"):
-                if "immediate" in current_section:
-                    immediate_actions.append(line[1:].strip())
-                elif "resolution" in current_section or "preventive" in current_section:
-                    resolution_steps.append(line[1:].strip())
-            else:
-                current_section = line.lower()
-        
-        return {
-            "severity": severity,
-            "impact": impact,
-            "immediate_actions": immediate_actions,
-            "resolution_steps": resolution_steps
-        }
+    @staticmethod
+    def _sentinel_start(message: str, message_lc: str, sentinels) -> Optional[int]:
+        """Index of the earliest sentinel in the message, or None if none occur"""
+        positions = [i for i in (message_lc.find(sentinel) for sentinel in sentinels) if i != -1]
+        if not positions:
+            return None
+        # Lowercasing can change the length of some non-ASCII text; fall back to a full search
+        return min(positions) if len(message_lc) == len(message) else 0
 
     def _extract_specific_error(self, message: str) -> str:
         """Extract specific error from message in human readable format"""
         try:
             # Try to parse JSON if message is in JSON format
             if message.startswith('{'):
-                data = json.loads(message)
+                data = orjson.loads(message)
                 if 'message' in data:
                     message = data['message']
 
-            # Common error patterns
-            patterns = [
-                # SQL errors
-                (r'SQLSTATE\[(\w+)\].*?(?:errno\s*=\s*(\d+))?\s*(.+?)(?=\s*\(|$)', 
-                 lambda m: f"SQL Error {m.group(1)}: {m.group(3).strip()}"),
-                
-                # Laravel exceptions
-                (r'exception\s*\'(.+?)\'\s*with\s*message\s*\'(.+?)\'',
-                 lambda m: f"{m.group(1)}: {m.group(2)}"),
-                
-                # General error patterns
-                (r'error:(.+?)(?=\s*at\s|$)', 
-                 lambda m: m.group(1).strip()),
-                
-                # Connection errors
-                (r'(connection\s+\w+|refused|timed?\s*out|couldn\'t\s+connect)(.+?)(?=\s*at\s|$)',
-                 lambda m: f"Connection Error: {m.group(0)}"),
-                
-                # Authentication errors
-                (r'(auth\w*\s+failed|permission\s+denied|access\s+denied)(.+?)(?=\s*at\s|$)',
-                 lambda m: f"Authentication Error: {m.group(0)}")
-            ]
-
-            # Try each pattern
-            for pattern, formatter in patterns:
-                match = re.search(pattern, message, re.IGNORECASE)
+            # Try each pattern whose sentinel occurs in the message
+            message_lc = message.lower()
+            for sentinels, pattern, formatter in self._specific_patterns:
+                start = self._sentinel_start(message, message_lc, sentinels)
+                if start is None:
+                    continue
+                match = pattern.search(message, start)
                 if match:
                     return formatter(match)
 
             # If no pattern matches, clean up the message
-            cleaned = re.sub(r'\s+', ' ', message).strip()
+            cleaned = _WS_RE.sub(' ', message).strip()
             return cleaned[:150] + ('...' if len(cleaned) > 150 else '')
 
         except Exception as e:
@@ -292,15 +568,21 @@ class AIService:
 
     def _extract_priority(self, analysis: str) -> str:
         """Extract priority level from analysis text."""
-        priority_levels = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
-        for level in priority_levels:
-            if level in analysis.upper():
+        found = set(_SEVERITY_RE.findall(analysis.upper()))
+        for level in _PRIORITY_LEVELS:
+            if level in found:
                 return level
         return "MEDIUM"
 
-    def analyze_logs_batch(self, logs: List[ElkLog]) -> List[Dict[str, str]]:
-        """Analyze multiple logs and group related issues."""
-        analyses = [self.analyze_log(log) for log in logs]
+    async def analyze_logs_batch(self, logs: List[ElkLog]) -> List[Dict[str, str]]:
+        """Analyze multiple logs concurrently and group related issues."""
+        results = await asyncio.gather(*[self.analyze_log(log) for log in logs], return_exceptions=True)
+        analyses = []
+        for log, result in zip(logs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error analyzing log {log.id}: {result}")
+            else:
+                analyses.append(result)
         
         # Group similar errors
         grouped_analyses = self._group_similar_errors(analyses)
@@ -326,62 +608,31 @@ class AIService:
             Prompt:
             {prompt}
             
-            Provide response in the following format:
-            1. Analysis
-            2. Recommendations (include file paths in backticks where relevant)
-            3. Code Suggestions (include file paths in backticks)
-            4. Next Steps
+            Respond ONLY with a JSON object with these keys:
+            analysis (string), recommendations (list of strings, include file paths in
+            backticks where relevant), code_suggestions (list of strings, include file paths
+            in backticks), next_steps (list of strings).
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            content = await self._call_openai(
+                model=self.model_tiers["analysis"],
                 messages=[{"role": "user", "content": formatted_prompt}],
+                response_format={"type": "json_object"},
                 temperature=0.7
             )
             
-            analysis = response.choices[0].message.content
-            
-            # Parse the response into structured format
-            return self._parse_custom_analysis(analysis)
+            data = orjson.loads(content)
+            return {
+                "analysis": str(data.get("analysis") or ""),
+                "recommendations": _as_list(data.get("recommendations")),
+                "code_suggestions": _as_list(data.get("code_suggestions")),
+                "next_steps": _as_list(data.get("next_steps"))
+            }
             
         except Exception as e:
             logger.error(f"Error in analyze_custom_prompt: {e}")
             raise
 
-    def _parse_custom_analysis(self, analysis: str) -> dict:
-        """Parse custom analysis into structured format"""
-        sections = analysis.split('\n')
-        result = {
-            "analysis": "",
-            "recommendations": [],
-            "code_suggestions": [],
-            "next_steps": []
-        }
-        
-        current_section = ""
-        
-        for line in sections:
-            line = line.strip()
-            if not line:
-                continue
-            
-            if "Analysis" in line:
-                current_section = "analysis"
-            elif "Recommendations" in line:
-                current_section = "recommendations"
-            elif "Code Suggestions" in line:
-                current_section = "code_suggestions"
-            elif "Next Steps" in line:
-                current_section = "next_steps"
-            elif line.startswith("-"):
-                if current_section in ["recommendations", "code_suggestions", "next_steps"]:
-                    result[current_section].append(line[1:].strip())
-            else:
-                if current_section == "analysis":
-                    result["analysis"] += line + "\n"
-        
-        return result
-
     def get_latest_response(self):
         """
         Retrieve the latest analysis response
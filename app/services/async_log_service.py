@@ -0,0 +1,201 @@
+from app.repositories.async_log_repository import AsyncLogRepository
+from app.models.log_model import ElkLog, AnalysisBatch
+from typing import List, Optional
+from app.services.ai_service import AIService, error_signature
+import httpx
+from datetime import datetime
+from collections import Counter, defaultdict
+import logging
+import orjson
+import asyncio
+import re
+
+logger = logging.getLogger(__name__)
+
+# Level keys of a raw event.original, read without decoding the whole event
+_LEVEL_NAME_RE = re.compile(r'"level_name"\s*:\s*"([A-Z]+)"')
+_LEVEL_NUM_RE = re.compile(r'"level"\s*:\s*(\d+)')
+
+class AsyncLogService:
+    """Batch analysis and webhook notifications for the FastAPI endpoints.
+
+    Counterpart of LogService on the Motor-backed AsyncLogRepository.
+    """
+
+    def __init__(self, log_repository: AsyncLogRepository):
+        self.log_repository = log_repository
+        self.webhook_url = "https://multichannel-channels-partnerships-qa-api.kartrocket.com/v1/byte-fusion/ai-webhook"
+        self.webhook_timeout = 30
+        # One pooled client so webhook posts reuse connections and TLS sessions
+        self._http = httpx.AsyncClient(
+            verify=False,
+            timeout=self.webhook_timeout,
+            http2=True,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "LogAnalyzer/1.0"
+            }
+        )
+
+    async def aclose(self):
+        """Close the shared webhook HTTP client"""
+        await self._http.aclose()
+
+    async def get_batch_analysis(self, batch_id: str) -> Optional[AnalysisBatch]:
+        """Get analysis results"""
+        return await self.log_repository.get_batch(batch_id)
+
+    async def send_webhook_notification(self, analysis_data: dict, batch_id: str, elk_ids: List[str]):
+        """Send webhook notification with analysis summary"""
+        try:
+            # Tally severities, error types and critical files in one pass
+            severity_counts = Counter()
+            error_types = Counter()
+            critical_files = []
+            for a in analysis_data["analyses"]:
+                severity_counts[a["severity"]] += 1
+                error_types[a["error_type"]] += 1
+                if a["needs_immediate_attention"]:
+                    critical_files.append({
+                        "file": a["file_location"],
+                        "error_type": a["error_type"],
+                        "error_message": a["error_message"],
+                        "elk_id": a["elk_id"]
+                    })
+
+            # Prepare webhook payload
+            webhook_payload = {
+                "data": {
+                    "timestamp": analysis_data["timestamp"],
+                    "batch_id": batch_id,
+                    "elk_ids": elk_ids,
+                    "total_errors": analysis_data["total_errors"],
+                    "analyses": analysis_data["analyses"],
+                    "summary": {
+                        "high_severity": severity_counts["HIGH"],
+                        "medium_severity": severity_counts["MEDIUM"],
+                        "low_severity": severity_counts["LOW"],
+                        "critical_files": critical_files,
+                        "error_types": dict(error_types)
+                    }
+                }
+            }
+            logger.debug("Sending webhook payload: %s", webhook_payload)
+            # Send webhook
+            response = await self._http.post(
+                self.webhook_url,
+                content=orjson.dumps(webhook_payload, default=str)
+            )
+            response.raise_for_status()
+            logger.info(f"Webhook sent successfully. Status: {response.status_code}")
+
+        except Exception as e:
+            logger.error(f"Error in send_webhook_notification: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def _is_error(log: ElkLog) -> bool:
+        """Whether the log's level, or its event.original level, marks an error.
+
+        The raw event is scanned for its level keys; it is only decoded, to rule
+        out a level nested in the context, when the scan finds an error level.
+        """
+        if log.source.level in ("ERROR", "EMERGENCY"):
+            logger.debug("Log %s: error found in source level", log.id)
+            return True
+
+        original = (log.source.event or {}).get("original")
+        if not isinstance(original, str):
+            return False
+        if not ("ERROR" in _LEVEL_NAME_RE.findall(original)
+                or any(int(level) >= 400 for level in _LEVEL_NUM_RE.findall(original))):
+            return False
+
+        event_data = log.event_parsed or {}
+        is_error = event_data.get("level_name") == "ERROR" or event_data.get("level", 0) >= 400
+        if is_error:
+            logger.debug("Log %s: error found in event data", log.id)
+        return is_error
+
+    async def analyze_and_save_batch(
+        self,
+        logs: List[ElkLog],
+        ai_service: AIService,
+        custom_prompt: str = None,
+        sync: bool = True
+    ) -> Optional[str]:
+        """Analyze logs and save results, then send webhook.
+
+        With sync=False the analyses go through the OpenAI Batch API, which is
+        cheaper but may take hours; use it only for scheduled, non-interactive runs.
+        """
+        try:
+            analyses = []
+            error_logs = []
+            elk_ids = []
+            
+            logger.info(f"Processing {len(logs)} logs for analysis")
+            
+            candidate_logs = [log for log in logs if self._is_error(log)]
+            logger.debug("%d of %d logs are errors", len(candidate_logs), len(logs))
+
+            # Recurring errors share one analysis; only the first of each group is sent
+            groups = defaultdict(list)
+            for log in candidate_logs:
+                groups[error_signature(log)].append(log)
+            representatives = [group[0] for group in groups.values()]
+            logger.info(f"{len(candidate_logs)} error logs grouped into {len(groups)} signatures")
+
+            if custom_prompt:
+                # Custom prompts are per log; run them concurrently
+                results = await asyncio.gather(
+                    *[ai_service.analyze_custom_prompt(custom_prompt, {"log": log.model_dump()}) for log in representatives],
+                    return_exceptions=True
+                )
+            elif sync:
+                # Analyze all error logs with bulk prompts
+                results = await ai_service.analyze_logs_bulk(representatives)
+            else:
+                # Half-price OpenAI Batch API; may take hours to complete
+                results = await ai_service.submit_batch_job(representatives)
+
+            for group, analysis in zip(groups.values(), results):
+                if analysis is None or isinstance(analysis, Exception):
+                    logger.error(f"Error analyzing log {group[0].id}: {analysis}")
+                    continue
+
+                for log in group:
+                    analyses.append({**analysis, "elk_id": log.elk_id})
+                    error_logs.append(log)
+                    if log.elk_id:
+                        elk_ids.append(log.elk_id)
+                    logger.debug("Added error log with elk_id: %s", log.elk_id)
+            
+            logger.info(f"Total error logs found: {len(error_logs)}")
+            logger.info(f"Total analyses: {len(analyses)}")
+            logger.info(f"Total elk_ids: {len(elk_ids)}")
+            
+            if error_logs:
+                logger.info(f"Found {len(error_logs)} errors to analyze")
+                batch_id = await self.log_repository.save_batch(error_logs, analyses)
+                
+                # Prepare and send webhook
+                analysis_data = {
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "total_errors": len(error_logs),
+                    "analyses": analyses
+                }
+                
+                try:
+                    await self.send_webhook_notification(analysis_data, batch_id, elk_ids)
+                except Exception as webhook_error:
+                    logger.error(f"Webhook notification failed but batch was saved. Error: {str(webhook_error)}")
+                
+                return batch_id
+            
+            logger.info("No errors found to analyze")
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error in analyze_and_save_batch: {str(e)}", exc_info=True)
+            return None
@@ -0,0 +1,153 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.models.log_model import ElkLog
+from app.services.ai_service import AIService, context_head, normalize_message
+import numpy as np
+import redis.asyncio as redis
+import hashlib
+import httpx
+import orjson
+import copy
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+class CachedAIService(AIService):
+    """AIService with a two-tier response cache.
+
+    Exact repeats (same message, level and event context) are served from Redis;
+    near repeats are matched against an in-process ring buffer of embeddings.
+    Both tiers hold full-model analyses only.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        redis_url: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        model_tiers: Optional[Dict[str, str]] = None,
+        ttl: int = 86400,
+        similarity_threshold: float = 0.9,
+        max_index_size: int = 10000
+    ):
+        super().__init__(api_key, http_client=http_client, model_tiers=model_tiers)
+        self.redis = redis.from_url(redis_url)
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_index_size = max_index_size
+        # Ring buffer of unit vectors, allocated once the embedding size is known
+        self._embeddings: Optional[np.ndarray] = None
+        self._indexed_analyses: List[Optional[dict]] = [None] * max_index_size
+        self._index_count = 0
+        self._index_next = 0
+
+    async def aclose(self):
+        """Close the OpenAI client and the Redis connection pool"""
+        await super().aclose()
+        await self.redis.aclose()
+
+    async def _full_analysis(self, log: ElkLog) -> dict:
+        """Full analysis of a log, reusing a cached analysis of the same or a similar error.
+
+        Only full-model analyses are cached; analyze_log's triage-only answers
+        are not, so bulk callers never receive one from the cache.
+        """
+        async def analyze(misses: List[ElkLog]) -> List[Optional[dict]]:
+            return [await AIService._full_analysis(self, misses[0])]
+
+        return (await self._analyze_cached([log], analyze))[0]
+
+    async def analyze_logs_bulk(self, logs: List[ElkLog]) -> List[Optional[dict]]:
+        """Analyze logs in bulk, sending only cache misses to the model"""
+        return await self._analyze_cached(logs, lambda misses: AIService.analyze_logs_bulk(self, misses))
+
+    async def submit_batch_job(
+        self,
+        logs: List[ElkLog],
+        poll_interval: float = 60
+    ) -> List[Optional[dict]]:
+        """Analyze logs through the Batch API, submitting only cache misses"""
+        return await self._analyze_cached(
+            logs, lambda misses: AIService.submit_batch_job(self, misses, poll_interval=poll_interval)
+        )
+
+    async def _analyze_cached(
+        self,
+        logs: List[ElkLog],
+        analyze: Callable[[List[ElkLog]], Awaitable[List[Optional[dict]]]]
+    ) -> List[Optional[dict]]:
+        keys = [self._cache_key(log) for log in logs]
+        results = await self._get_exact(keys)
+
+        # Semantic lookup for exact misses
+        misses = [i for i, result in enumerate(results) if result is None]
+        embeddings = {}
+        if misses:
+            vectors = await self._embed([self._embedding_text(logs[i]) for i in misses])
+            if vectors is not None:
+                for i, vector in zip(misses, vectors):
+                    embeddings[i] = vector
+                    results[i] = self._get_similar(vector)
+
+        # Analyze whatever is still missing and cache the results
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            fresh = await analyze([logs[i] for i in misses])
+            for i, analysis in zip(misses, fresh):
+                results[i] = analysis
+                if analysis is not None:
+                    await self._store(keys[i], embeddings.get(i), analysis)
+
+        return results
+
+    def _cache_key(self, log: ElkLog) -> str:
+        key = f"{log.source.message}|{log.source.level}|{context_head(log)}"
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f"ai_analysis:{digest}"
+
+    def _embedding_text(self, log: ElkLog) -> str:
+        return f"{normalize_message(log.source.message)}\n{context_head(log)}"
+
+    async def _get_exact(self, keys: List[str]) -> List[Optional[dict]]:
+        try:
+            values = await self.redis.mget(keys)
+        except Exception as e:
+            logger.warning(f"Redis lookup failed: {e}")
+            return [None] * len(keys)
+        return [orjson.loads(value) if value else None for value in values]
+
+    async def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Unit-normalized embeddings for texts, or None if the request fails"""
+        try:
+            response = await self.client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+        except Exception as e:
+            logger.warning(f"Embedding request failed: {e}")
+            return None
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _get_similar(self, vector: np.ndarray) -> Optional[dict]:
+        if not self._index_count:
+            return None
+        scores = self._embeddings[:self._index_count] @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return copy.deepcopy(self._indexed_analyses[best])
+
+    async def _store(self, key: str, vector: Optional[np.ndarray], analysis: dict):
+        try:
+            await self.redis.setex(key, self.ttl, orjson.dumps(analysis, default=str))
+        except Exception as e:
+            logger.warning(f"Redis store failed: {e}")
+
+        if vector is None:
+            return
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_index_size, vector.shape[0]), dtype=np.float32)
+        # Overwrite the oldest entry in place once the buffer is full
+        self._embeddings[self._index_next] = vector
+        self._indexed_analyses[self._index_next] = copy.deepcopy(analysis)
+        self._index_next = (self._index_next + 1) % self.max_index_size
+        self._index_count = min(self._index_count + 1, self.max_index_size)
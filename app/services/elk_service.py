@@ -1,15 +1,16 @@
-from elasticsearch import Elasticsearch
-from typing import List
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
+from typing import AsyncIterator
 from datetime import datetime, timedelta
 from app.models.log_model import ElkLog
 
 class ElkService:
     def __init__(self, elk_url: str, index_pattern: str = "sr-api-internal-laravel-*"):
-        self.client = Elasticsearch(elk_url)
+        self.client = AsyncElasticsearch(elk_url)
         self.index_pattern = index_pattern
 
-    def get_recent_logs(self, minutes: int = 5) -> List[dict]:
-        """Get logs from the last n minutes"""
+    async def get_recent_logs(self, minutes: int = 5, size: int = 500) -> AsyncIterator[dict]:
+        """Stream logs from the last n minutes, newest first, fetching `size` hits per page"""
         query = {
             "bool": {
                 "must": [
@@ -25,11 +26,14 @@ class ElkService:
             }
         }
 
-        response = self.client.search(
+        async for hit in async_scan(
+            self.client,
             index=self.index_pattern,
-            query=query,
-            size=100,  # Adjust size as needed
-            sort=[{"@timestamp": {"order": "desc"}}]
-        )
+            query={"query": query, "sort": [{"@timestamp": {"order": "desc"}}]},
+            size=size,
+            preserve_order=True
+        ):
+            yield hit
 
-        return [hit for hit in response['hits']['hits']] 
\ No newline at end of file
+    async def close(self):
+        await self.client.close()
@@ -1,5 +1,4 @@
 from pathlib import Path
-from app.utils.generate_placeholder import generate_placeholder_image
 
 def setup_static_directory():
     # Create static directory structure
@@ -11,9 +10,12 @@ def setup_static_directory():
     static_dir.mkdir(exist_ok=True)
     images_dir.mkdir(exist_ok=True)
     
-    # Generate placeholder image
-    image_path = generate_placeholder_image()
-    print(f"Created placeholder image at: {image_path}")
+    # The placeholder image ships with the repo; only draw it (and import
+    # Pillow) when it is missing
+    if not (images_dir / "log-analyzer.png").exists():
+        from app.utils.generate_placeholder import generate_placeholder_image
+        image_path = generate_placeholder_image()
+        print(f"Created placeholder image at: {image_path}")
     return static_dir
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-import requests
+import httpx
 import os
 from typing import Optional
 
@@ -7,10 +7,12 @@ class SlackNotifier:
         self.webhook_url = webhook_url or os.getenv('SLACK_WEBHOOK_URL')
         if not self.webhook_url:
             raise ValueError("Slack webhook URL is required")
+        # Pooled client so repeated notifications reuse the connection to Slack
+        self._client = httpx.AsyncClient(timeout=10)
 
-    def send_notification(self, message: str) -> bool:
+    async def send_notification(self, message: str) -> bool:
         try:
-            response = requests.post(
+            response = await self._client.post(
                 self.webhook_url,
                 json={"text": message}
             )
@@ -18,4 +20,7 @@ class SlackNotifier:
             return True
         except Exception as e:
             print(f"Failed to send Slack notification: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    async def aclose(self):
+        await self._client.aclose()
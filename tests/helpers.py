@@ -0,0 +1,11 @@
+import orjson
+
+from app.models.log_model import ElkLog
+
+
+def make_log(message="boom", **source):
+    return ElkLog.model_validate({"_index": "logs", "_id": "1", "_source": {"message": message, **source}})
+
+
+def make_event(data):
+    return {"original": orjson.dumps(data).decode()}
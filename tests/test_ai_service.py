@@ -0,0 +1,317 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import orjson
+import pytest
+from openai import BadRequestError, InternalServerError
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+from tenacity import wait_none
+
+from app.services.ai_service import AIService, TruncatedResponseError, error_signature
+from helpers import make_event, make_log
+
+
+def status_error(error_class, status_code):
+    response = httpx.Response(status_code, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return error_class("error", response=response, body=None)
+
+
+@pytest.fixture
+def ai_service():
+    return AIService("test-key")
+
+
+@pytest.mark.parametrize("message, error_type, error_message, status_code", [
+    ("Request failed with 404 error: Not Found at /var/www/app.php",
+     "HTTP Error", "Status 404: Not Found", 404),
+    ("SQLSTATE[HY000] [2002] Connection refused (SQL: select 1)",
+     "Database Error", "SQL Error HY000: [2002] Connection refused", 500),
+    ("Authentication failed for user bob",
+     "Authentication Error", "Authentication failed for user bob", 401),
+    ("Connection timed out after 30s",
+     "Connection Error", "Connection failed: Connection timed out after 30s", 503),
+    ("exception 'RuntimeException' with message 'Boom'",
+     "Application Error", "RuntimeException: Boom", 500),
+    ('{"message": "permission denied for table", "status_code": 403}',
+     "Authentication Error", "permission denied for table", 403),
+    ("status code: 502 upstream   unavailable",
+     "Unknown Error", "status code: 502 upstream unavailable", 502),
+])
+def test_extract_error_details(ai_service, message, error_type, error_message, status_code):
+    assert ai_service._extract_error_details(make_log(message)) == {
+        "error_type": error_type,
+        "error_message": error_message,
+        "status_code": status_code
+    }
+
+
+def test_extract_error_details_ignores_codes_inside_longer_numbers(ai_service):
+    details = ai_service._extract_error_details(make_log("order 123456: shipped"))
+    assert details["error_type"] == "Unknown Error"
+
+
+def test_extract_error_details_truncates_unmatched_messages(ai_service):
+    details = ai_service._extract_error_details(make_log("x" * 200))
+    assert details["error_message"] == "x" * 150 + "..."
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Request failed with error: Not Found at /var/www/app.php", "Not Found"),
+    ("SQLSTATE[23000] Integrity constraint violation (SQL: insert)", "SQL Error 23000: Integrity constraint violation"),
+    ("exception 'RuntimeException' with message 'Boom'", "RuntimeException: Boom"),
+    ("Connection refused by host", "Connection Error: Connection refused by host"),
+    ("Access denied for user 'root'", "Authentication Error: Access denied for user 'root'"),
+    ('{"message": "Error: disk full"}', "disk full"),
+    ("nothing   to see here", "nothing to see here"),
+])
+def test_extract_specific_error(ai_service, message, expected):
+    assert ai_service._extract_specific_error(message) == expected
+
+
+def test_extract_specific_error_bounds_captures(ai_service):
+    message = "error: " + "x" * 1000
+    assert ai_service._extract_specific_error(message) == message[:150] + "..."
+
+
+@pytest.mark.parametrize("message, sentinels, expected", [
+    ("Foo Error: bar", ("error:",), 4),
+    ("timed out, connection reset", ("connection", "time"), 0),
+    ("all good", ("error:",), None),
+    # Lowercasing changes the length, so the search starts from the beginning
+    ("İx error: bar", ("error:",), 0),
+])
+def test_sentinel_start(message, sentinels, expected):
+    assert AIService._sentinel_start(message, message.lower(), sentinels) == expected
+
+
+def test_error_signature_ignores_volatile_tokens():
+    first = make_log(
+        "Order 12345 failed at 2025-02-08T10:00:00Z for 3f2b8c1e-9d4a-4b7e-8f00-1a2b3c4d5e6f",
+        level_name="ERROR",
+        event=make_event({"context": {"http_code": 502, "exception": "Gateway timeout after 30 s\n#0 stack"}})
+    )
+    second = make_log(
+        "Order 999 failed at 2025-03-01 11:22:33 for 00000000-1111-2222-3333-444444444444",
+        level_name="ERROR",
+        event=make_event({"context": {"http_code": 502, "exception": "Gateway timeout after 5 s\n#1 other"}})
+    )
+    assert error_signature(first) == "ERROR|Order # failed at # for #|http 502 | Gateway timeout after # s"
+    assert error_signature(first) == error_signature(second)
+
+
+def test_error_signature_separates_generic_messages_by_context():
+    redis = make_log("traces", level_name="ERROR", event=make_event({"context": {"trace": "RedisException: refused"}}))
+    sql = make_log("traces", level_name="ERROR", event=make_event({"context": {"trace": "PDOException: gone away"}}))
+    assert error_signature(redis) != error_signature(sql)
+
+
+def test_error_signature_separates_levels():
+    assert error_signature(make_log("boom", level_name="ERROR")) != error_signature(make_log("boom", level_name="INFO"))
+
+
+def test_parse_chunk_aligns_analyses_by_id(ai_service):
+    logs = [make_log("first"), make_log("second"), make_log("third")]
+    content = orjson.dumps({"analyses": [
+        {"id": 2, "error_type": "Database Error", "severity": "high", "status_code": "503"},
+        {"id": 0, "description": "Cache miss", "severity": "low", "immediate_actions": ["Warm the cache"]},
+    ]}).decode()
+
+    first, second, third = ai_service._parse_chunk(content, logs)
+
+    assert second is None
+    assert first["error_message"] == "Cache miss"
+    assert first["severity"] == "LOW"
+    assert first["immediate_actions"] == ["Warm the cache"]
+    assert first["needs_immediate_attention"] is False
+    assert third["error_type"] == "Database Error"
+    assert third["error_message"] == "third"
+    assert third["status_code"] == 503
+    assert third["needs_immediate_attention"] is True
+
+
+def test_parse_chunk_skips_malformed_items(ai_service):
+    logs = [make_log("first"), make_log("second")]
+    content = orjson.dumps({"analyses": ["junk", {"id": "1"}, {"id": 5}, {"status_code": 404}]}).decode()
+    assert ai_service._parse_chunk(content, logs) == [None, None]
+
+
+def test_parse_chunk_rejects_invalid_json(ai_service):
+    with pytest.raises(orjson.JSONDecodeError):
+        ai_service._parse_chunk("not json", [make_log("first")])
+
+
+def test_analyze_log_answers_non_high_logs_with_triage(ai_service):
+    ai_service._call_openai = AsyncMock(return_value=orjson.dumps({"severity": "low", "error_type": "Triage"}).decode())
+
+    analysis = asyncio.run(ai_service.analyze_log(make_log("boom")))
+
+    assert analysis["severity"] == "LOW"
+    assert analysis["error_type"] == "Triage"
+    models = [call.kwargs["model"] for call in ai_service._call_openai.call_args_list]
+    assert models == [ai_service.model_tiers["triage"]]
+
+
+@pytest.mark.parametrize("triage_reply", [
+    orjson.dumps({"severity": "HIGH", "error_type": "Triage"}).decode(),
+    orjson.dumps({"severity": "unknown"}).decode(),
+    "not json",
+    status_error(InternalServerError, 500),
+])
+def test_analyze_log_escalates_to_the_analysis_model(ai_service, triage_reply):
+    full_reply = orjson.dumps({"severity": "HIGH", "error_type": "Full"}).decode()
+    ai_service._call_openai = AsyncMock(side_effect=[triage_reply, full_reply])
+
+    analysis = asyncio.run(ai_service.analyze_log(make_log("boom")))
+
+    assert analysis["error_type"] == "Full"
+    models = [call.kwargs["model"] for call in ai_service._call_openai.call_args_list]
+    assert models == [ai_service.model_tiers["triage"], ai_service.model_tiers["analysis"]]
+
+
+def test_analyze_logs_bulk_retries_missing_logs_without_triage(ai_service):
+    logs = [make_log("first"), make_log("second")]
+    replies = [
+        orjson.dumps({"analyses": [{"id": 0, "severity": "HIGH", "error_type": "Bulk"}]}).decode(),
+        orjson.dumps({"severity": "LOW", "error_type": "Retried"}).decode()
+    ]
+    ai_service._call_openai = AsyncMock(side_effect=replies)
+
+    results = asyncio.run(ai_service.analyze_logs_bulk(logs))
+
+    assert [r["error_type"] for r in results] == ["Bulk", "Retried"]
+    models = [call.kwargs["model"] for call in ai_service._call_openai.call_args_list]
+    assert models == [ai_service.model_tiers["analysis"]] * 2
+
+
+def batch_output_line(index, analyses, finish_reason="stop"):
+    return orjson.dumps({
+        "custom_id": f"chunk-{index}",
+        "response": {"body": {"choices": [{
+            "finish_reason": finish_reason,
+            "message": {"content": orjson.dumps({"analyses": analyses}).decode()}
+        }]}}
+    }).decode()
+
+
+def test_submit_batch_job_aligns_results_with_logs(ai_service):
+    logs = [make_log(f"log {i}") for i in range(12)]
+    output = "\n".join([
+        # Out of order; chunk 0 was truncated and chunk 2 is missing
+        batch_output_line(1, [{"id": 4, "error_type": "Last"}, {"id": 0, "error_type": "First"}]),
+        batch_output_line(0, [{"id": 0, "error_type": "Truncated"}], finish_reason="length"),
+        ""
+    ])
+    ai_service.client = MagicMock()
+    ai_service.client.files.create = AsyncMock(return_value=MagicMock(id="file-1"))
+    ai_service.client.batches.create = AsyncMock(return_value=MagicMock(id="batch-1", status="in_progress"))
+    ai_service.client.batches.retrieve = AsyncMock(
+        return_value=MagicMock(id="batch-1", status="completed", output_file_id="file-2")
+    )
+    ai_service.client.files.content = AsyncMock(return_value=MagicMock(text=output))
+
+    results = asyncio.run(ai_service.submit_batch_job(logs, poll_interval=0))
+
+    assert len(results) == len(logs)
+    assert results[:5] == [None] * 5
+    assert results[5]["error_type"] == "First"
+    assert results[5]["error_message"] == "log 5"
+    assert results[6:9] == [None] * 3
+    assert results[9]["error_type"] == "Last"
+    assert results[10:] == [None] * 2
+
+    requests = ai_service.client.files.create.call_args.kwargs["file"][1].splitlines()
+    assert [orjson.loads(line)["custom_id"] for line in requests] == ["chunk-0", "chunk-1", "chunk-2"]
+
+
+def test_submit_batch_job_without_logs_submits_nothing(ai_service):
+    ai_service.client = MagicMock()
+    assert asyncio.run(ai_service.submit_batch_job([])) == []
+    ai_service.client.files.create.assert_not_called()
+
+
+def completion_chunk(content=None, finish_reason=None, usage=None):
+    choices = [] if usage else [Choice(index=0, delta=ChoiceDelta(content=content), finish_reason=finish_reason)]
+    return ChatCompletionChunk(
+        id="chunk", object="chat.completion.chunk", created=0, model="gpt-4o-mini", choices=choices, usage=usage
+    )
+
+
+async def fake_stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.parametrize("finish_reason", ["stop", "length"])
+def test_call_openai_accumulates_stream_deltas(ai_service, finish_reason):
+    ai_service.client = MagicMock()
+    ai_service.client.chat.completions.create = AsyncMock(return_value=fake_stream(
+        completion_chunk('{"severity": '),
+        completion_chunk(),
+        completion_chunk('"LOW"}', finish_reason=finish_reason),
+        # The final usage-only chunk has no choices
+        completion_chunk(usage=CompletionUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15))
+    ))
+
+    call = ai_service._call_openai(model="gpt-4o-mini", messages=[])
+    if finish_reason == "length":
+        with pytest.raises(TruncatedResponseError):
+            asyncio.run(call)
+    else:
+        assert asyncio.run(call) == '{"severity": "LOW"}'
+    ai_service.client.chat.completions.create.assert_awaited_once()
+
+
+@pytest.mark.parametrize("error, attempts", [
+    (status_error(InternalServerError, 500), 3),
+    (status_error(BadRequestError, 400), 1),
+])
+def test_tenacity_is_the_only_retry_layer(ai_service, error, attempts):
+    assert ai_service.client.max_retries == 0
+
+    ai_service.client = MagicMock()
+    ai_service.client.chat.completions.create = AsyncMock(side_effect=error)
+    call_openai = AIService._call_openai.retry_with(wait=wait_none())
+
+    with pytest.raises(type(error)):
+        asyncio.run(call_openai(ai_service, model="gpt-4o-mini", messages=[]))
+    assert ai_service.client.chat.completions.create.await_count == attempts
+
+
+@pytest.mark.parametrize("severity, expected, needs_attention", [
+    ("HIGH", "HIGH", True),
+    ("High - urgent", "HIGH", True),
+    ("critical", "HIGH", True),
+    (" low ", "LOW", False),
+    ("unknown", "MEDIUM", False),
+    (None, "MEDIUM", False),
+])
+def test_build_analysis_normalizes_severity(ai_service, severity, expected, needs_attention):
+    analysis = ai_service._build_analysis({"severity": severity}, make_log("boom"))
+    assert analysis["severity"] == expected
+    assert analysis["needs_immediate_attention"] is needs_attention
+
+
+def test_build_analysis_wraps_string_lists(ai_service):
+    analysis = ai_service._build_analysis(
+        {"immediate_actions": "Restart DB", "long_term_solutions": ["Add a replica", "Alert on lag"]},
+        make_log("boom")
+    )
+    assert analysis["immediate_actions"] == ["Restart DB"]
+    assert analysis["resolution_steps"] == ["Add a replica", "Alert on lag"]
+
+
+def test_analyze_custom_prompt_wraps_string_lists(ai_service):
+    reply = orjson.dumps({"analysis": "Disk full", "recommendations": "Free space", "next_steps": None}).decode()
+    ai_service._call_openai = AsyncMock(return_value=reply)
+
+    result = asyncio.run(ai_service.analyze_custom_prompt("why?", {"log": {}}))
+
+    assert result == {
+        "analysis": "Disk full",
+        "recommendations": ["Free space"],
+        "code_suggestions": [],
+        "next_steps": []
+    }
@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import orjson
+import pytest
+
+from app.services.async_log_service import AsyncLogService
+from helpers import make_event, make_log
+
+
+@pytest.mark.parametrize("source, expected", [
+    ({"level_name": "ERROR"}, True),
+    ({"level_name": "EMERGENCY"}, True),
+    ({"level_name": "INFO"}, False),
+    ({}, False),
+    ({"event": make_event({"level_name": "ERROR"})}, True),
+    ({"event": make_event({"level": 400})}, True),
+    ({"event": make_event({"level": 200, "level_name": "INFO"})}, False),
+    # Only top-level keys of the event count, not levels nested in its context
+    ({"event": make_event({"level": 200, "context": {"level": 500, "level_name": "ERROR"}})}, False),
+    ({"event": {"original": 'not json "level_name": "ERROR"'}}, False),
+    ({"event": {"original": None}}, False),
+])
+def test_is_error(source, expected):
+    assert AsyncLogService._is_error(make_log(**source)) is expected
+
+
+def test_is_error_reads_filebeat_level():
+    log = make_log(msg={"level_name": "ERROR", "level": 400})
+    assert AsyncLogService._is_error(log) is True
+
+
+def test_analyze_and_save_batch_analyzes_each_signature_once():
+    service = AsyncLogService(MagicMock())
+    service.log_repository.save_batch = AsyncMock(return_value="batch-1")
+    service.send_webhook_notification = AsyncMock()
+    logs = [
+        make_log(message, level_name="ERROR").model_copy(update={"elk_id": elk_id})
+        for elk_id, message in enumerate(["Connection refused after 3 s", "Disk full", "Connection refused after 5 s"], 1)
+    ]
+    ai_service = MagicMock()
+    ai_service.analyze_logs_bulk = AsyncMock(return_value=[{"error_type": "Connection"}, {"error_type": "Disk"}])
+
+    assert asyncio.run(service.analyze_and_save_batch(logs, ai_service)) == "batch-1"
+
+    ai_service.analyze_logs_bulk.assert_awaited_once_with([logs[0], logs[1]])
+    error_logs, analyses = service.log_repository.save_batch.call_args.args
+    assert error_logs == [logs[0], logs[2], logs[1]]
+    assert analyses == [
+        {"error_type": "Connection", "elk_id": 1},
+        {"error_type": "Connection", "elk_id": 3},
+        {"error_type": "Disk", "elk_id": 2}
+    ]
+    assert analyses[0] is not analyses[1]
+
+
+def make_analysis(severity, error_type, elk_id, needs_immediate_attention=False):
+    return {
+        "severity": severity,
+        "error_type": error_type,
+        "error_message": f"{error_type} {elk_id}",
+        "file_location": f"app/{elk_id}.php",
+        "needs_immediate_attention": needs_immediate_attention,
+        "elk_id": elk_id
+    }
+
+
+def test_send_webhook_notification_summarizes_analyses():
+    service = AsyncLogService(MagicMock())
+    service._http = MagicMock()
+    service._http.post = AsyncMock(return_value=MagicMock(status_code=200))
+    analyses = [
+        make_analysis("HIGH", "Database Error", 1, needs_immediate_attention=True),
+        make_analysis("HIGH", "Database Error", 2, needs_immediate_attention=True),
+        make_analysis("MEDIUM", "HTTP Error", 3),
+        make_analysis("LOW", "Database Error", 4)
+    ]
+
+    asyncio.run(service.send_webhook_notification(
+        {"timestamp": "2025-02-08T10:00:00", "total_errors": 4, "analyses": analyses},
+        "batch-1",
+        [1, 2, 3, 4]
+    ))
+
+    payload = orjson.loads(service._http.post.call_args.kwargs["content"])["data"]
+    assert payload["batch_id"] == "batch-1"
+    assert payload["elk_ids"] == [1, 2, 3, 4]
+    assert payload["summary"] == {
+        "high_severity": 2,
+        "medium_severity": 1,
+        "low_severity": 1,
+        "critical_files": [
+            {"file": "app/1.php", "error_type": "Database Error", "error_message": "Database Error 1", "elk_id": 1},
+            {"file": "app/2.php", "error_type": "Database Error", "error_message": "Database Error 2", "elk_id": 2}
+        ],
+        "error_types": {"Database Error": 3, "HTTP Error": 1}
+    }
@@ -0,0 +1,106 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import numpy as np
+import orjson
+import pytest
+
+from app.services.cached_ai_service import CachedAIService
+from helpers import make_log
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def service():
+    service = CachedAIService("test-key", redis_url="redis://localhost:6379/0", max_index_size=2)
+    service.redis = AsyncMock()
+    service.redis.mget.return_value = [None, None, None, None]
+    return service
+
+
+def test_analyze_cached_aligns_hits_and_misses(service):
+    logs = [make_log(f"error {name}", level_name="ERROR") for name in ("cached", "fresh", "similar", "failed")]
+    service.redis.mget.return_value = [orjson.dumps({"from": "redis"}), None, None, None]
+    asyncio.run(service._store("other", unit(0, 0, 1), {"from": "index"}))
+    service.redis.setex.reset_mock()
+    service._embed = AsyncMock(return_value=np.stack([unit(1, 0, 0), unit(0, 0.1, 1), unit(0, 1, 0)]))
+    analyze = AsyncMock(return_value=[{"from": "model"}, None])
+
+    results = asyncio.run(service._analyze_cached(logs, analyze))
+
+    assert results == [{"from": "redis"}, {"from": "model"}, {"from": "index"}, None]
+    service._embed.assert_awaited_once()
+    assert len(service._embed.call_args.args[0]) == 3
+    assert analyze.call_args.args[0] == [logs[1], logs[3]]
+    # Only the fresh analysis is cached; the failed one is not
+    service.redis.setex.assert_awaited_once()
+    assert service.redis.setex.call_args.args[0] == service._cache_key(logs[1])
+    assert service._index_count == 2
+
+
+def test_analyze_cached_without_embeddings_sends_all_misses(service):
+    logs = [make_log("first", level_name="ERROR"), make_log("second", level_name="ERROR")]
+    service.redis.mget.return_value = [None, None]
+    service._embed = AsyncMock(return_value=None)
+    analyze = AsyncMock(return_value=[{"n": 1}, {"n": 2}])
+
+    assert asyncio.run(service._analyze_cached(logs, analyze)) == [{"n": 1}, {"n": 2}]
+    assert analyze.call_args.args[0] == logs
+    assert service._index_count == 0
+
+
+def test_redis_failures_fall_back_to_analysis(service):
+    service.redis.mget.side_effect = ConnectionError("down")
+    service.redis.setex.side_effect = ConnectionError("down")
+    service._embed = AsyncMock(return_value=None)
+    analyze = AsyncMock(return_value=[{"n": 1}])
+
+    assert asyncio.run(service._analyze_cached([make_log("first", level_name="ERROR")], analyze)) == [{"n": 1}]
+
+
+@pytest.mark.parametrize("severity, calls, stored", [
+    ("LOW", 1, False),
+    ("HIGH", 2, True),
+])
+def test_analyze_log_caches_only_full_analyses(service, severity, calls, stored):
+    service.redis.mget.return_value = [None]
+    service._embed = AsyncMock(return_value=None)
+    service._call_openai = AsyncMock(side_effect=[
+        orjson.dumps({"severity": severity, "error_type": "Triage"}).decode(),
+        orjson.dumps({"severity": "HIGH", "error_type": "Full"}).decode()
+    ])
+
+    asyncio.run(service.analyze_log(make_log("boom", level_name="ERROR")))
+
+    assert service._call_openai.await_count == calls
+    assert service.redis.setex.await_count == (1 if stored else 0)
+
+
+def test_ring_buffer_overwrites_oldest_entry(service):
+    for i, vector in enumerate([unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)]):
+        asyncio.run(service._store(f"key-{i}", vector, {"n": i}))
+
+    assert service._embeddings.shape == (2, 3)
+    assert service._index_count == 2
+    assert service._index_next == 1
+    # The first entry was evicted by the third
+    assert service._get_similar(unit(1, 0, 0)) is None
+    assert service._get_similar(unit(0, 1, 0)) == {"n": 1}
+    assert service._get_similar(unit(0, 0, 1)) == {"n": 2}
+
+
+def test_get_similar_returns_a_copy(service):
+    asyncio.run(service._store("key", unit(1, 0), {"actions": ["restart"]}))
+    service._get_similar(unit(1, 0))["actions"].append("mutated")
+    assert service._get_similar(unit(1, 0)) == {"actions": ["restart"]}
+
+
+def test_aclose_closes_redis(service):
+    service.client.close = AsyncMock()
+    asyncio.run(service.aclose())
+    service.redis.aclose.assert_awaited_once()
+    service.client.close.assert_awaited_once()
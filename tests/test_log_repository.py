@@ -0,0 +1,151 @@
+from unittest.mock import MagicMock
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.models.log_model import ElkLog
+from app.repositories.log_repository import LogRepository, UNANALYZED_LOG_PROJECTION, _encode_pydantic
+
+
+def make_repository():
+    # Skip __init__ so no MongoDB connection or index build is attempted
+    repository = LogRepository.__new__(LogRepository)
+    repository.collection = MagicMock()
+    return repository
+
+
+def make_doc(message, **fields):
+    return {"_id": ObjectId(), "_index": "logs", "_source": {"message": message}, **fields}
+
+
+def queue_pages(collection, *pages):
+    cursors = []
+    for page in pages:
+        cursor = MagicMock()
+        cursor.sort.return_value.limit.return_value.batch_size.return_value = iter(page)
+        cursors.append(cursor)
+    collection.find.side_effect = cursors
+
+
+def test_get_unanalyzed_logs_queries_raw_unanalyzed_logs():
+    repository = make_repository()
+    queue_pages(repository.collection, [])
+
+    assert list(repository.get_unanalyzed_logs(page_size=2)) == []
+
+    query = repository.collection.find.call_args.args[0]
+    assert query == {"analyzed": {"$ne": True}, "_index": {"$exists": True}}
+    assert repository.collection.find.call_args.kwargs["projection"] == UNANALYZED_LOG_PROJECTION
+
+
+def test_get_unanalyzed_logs_pages_by_id():
+    repository = make_repository()
+    first, second, third = make_doc("first"), make_doc("second"), make_doc("third")
+    queue_pages(repository.collection, [first, second], [third], [])
+
+    pages = list(repository.get_unanalyzed_logs(page_size=2))
+
+    assert [[log.source.message for log in page] for page in pages] == [["first", "second"], ["third"]]
+    assert pages[0][0].id == str(first["_id"])
+    queries = [call.args[0] for call in repository.collection.find.call_args_list]
+    assert "_id" not in queries[0]
+    assert queries[1]["_id"] == {"$gt": second["_id"]}
+    assert queries[2]["_id"] == {"$gt": third["_id"]}
+
+
+def test_get_unanalyzed_logs_skips_invalid_documents():
+    repository = make_repository()
+    invalid = {"_id": ObjectId(), "_index": "logs", "_source": {}}
+    queue_pages(repository.collection, [invalid], [make_doc("valid")], [])
+
+    pages = list(repository.get_unanalyzed_logs(page_size=1))
+
+    # A page of only invalid documents is skipped without ending the scan
+    assert [[log.source.message for log in page] for page in pages] == [["valid"]]
+
+
+LARAVEL_LOG = {
+    "_index": "logs",
+    "_id": "abc",
+    "_source": {
+        "@timestamp": "2025-02-08T10:00:00Z",
+        "message": "traces",
+        "level_name": "ERROR",
+        "event": {"original": "{}", "note": None}
+    }
+}
+
+
+def test_save_log_stores_aliases_without_null_fields():
+    repository = make_repository()
+    repository.collection.update_one.return_value.upserted_id = None
+
+    repository.save_log(ElkLog.model_validate(LARAVEL_LOG))
+
+    document = repository.collection.update_one.call_args.args[1]["$setOnInsert"]
+    assert document == {
+        "_index": "logs",
+        "_score": 0.0,
+        "_source": {
+            "@timestamp": ElkLog.model_validate(LARAVEL_LOG).source.timestamp,
+            "message": "traces",
+            "level_name": "ERROR",
+            # Values inside free-form dicts are kept as they are
+            "event": {"original": "{}", "note": None}
+        }
+    }
+
+
+def test_embedded_models_are_encoded_without_null_fields():
+    encoded = _encode_pydantic(ElkLog.model_validate(LARAVEL_LOG))
+    assert "agent" not in encoded["_source"]
+    assert "elk_id" not in encoded
+    assert encoded["_id"] == "abc"
+
+
+def test_save_error_and_analysis_requires_a_host():
+    repository = make_repository()
+    with pytest.raises(ValueError):
+        repository.save_error_and_analysis(ElkLog.model_validate(LARAVEL_LOG), {})
+    repository.collection.update_one.assert_not_called()
+
+
+def test_bulk_upsert_logs_upserts_each_log_by_timestamp_and_message():
+    repository = make_repository()
+    repository.collection.write_concern.acknowledged = True
+    repository.collection.bulk_write.return_value.upserted_count = 1
+    logs = [ElkLog.model_validate(LARAVEL_LOG), ElkLog.model_validate({**LARAVEL_LOG, "_source": {"message": "other"}})]
+
+    assert repository.bulk_upsert_logs(logs) == 1
+
+    assert repository.collection.bulk_write.call_args.args[0] == [
+        UpdateOne(
+            {"_source.@timestamp": log.source.timestamp, "_source.message": log.source.message},
+            {"$setOnInsert": log.model_dump(by_alias=True, exclude={"id"}, exclude_none=True)},
+            upsert=True
+        )
+        for log in logs
+    ]
+    assert repository.collection.bulk_write.call_args.kwargs == {"ordered": False, "bypass_document_validation": True}
+
+
+def test_bulk_upsert_logs_reports_none_for_unacknowledged_writes():
+    repository = make_repository()
+    repository.collection.write_concern.acknowledged = False
+    repository.collection.bulk_write.return_value.acknowledged = False
+
+    assert repository.bulk_upsert_logs([ElkLog.model_validate(LARAVEL_LOG)]) is None
+    assert repository.collection.bulk_write.call_args.kwargs["bypass_document_validation"] is False
+
+
+def test_bulk_upsert_logs_skips_empty_batches():
+    repository = make_repository()
+    assert repository.bulk_upsert_logs([]) == 0
+    repository.collection.bulk_write.assert_not_called()
+
+
+def test_bulk_update_skips_empty_batches():
+    repository = make_repository()
+    assert repository.bulk_update([]) == 0
+    repository.collection.bulk_write.assert_not_called()
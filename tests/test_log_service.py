@@ -0,0 +1,27 @@
+from unittest.mock import MagicMock
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.services.log_service import LogService
+
+
+def test_bulk_mark_analyzed_sends_one_bulk_update():
+    repository = MagicMock()
+    repository.bulk_update.return_value = 2
+    first, second = str(ObjectId()), str(ObjectId())
+
+    assert LogService(repository).bulk_mark_analyzed([(first, {"severity": "HIGH"}), (second, {"severity": "LOW"})]) == 2
+
+    repository.bulk_update.assert_called_once_with([
+        UpdateOne({"_id": ObjectId(first)}, {"$set": {"analyzed": True, "ai_response": {"severity": "HIGH"}}}),
+        UpdateOne({"_id": ObjectId(second)}, {"$set": {"analyzed": True, "ai_response": {"severity": "LOW"}}})
+    ])
+
+
+def test_bulk_mark_analyzed_with_nothing_analyzed():
+    repository = MagicMock()
+    repository.bulk_update.return_value = 0
+
+    assert LogService(repository).bulk_mark_analyzed([]) == 0
+    repository.bulk_update.assert_called_once_with([])